@@ -0,0 +1,102 @@
+"""
+Memory benchmark for the per-cell and per-element model classes.
+
+For every class the bytes per instance are measured for the current slotted
+layout ("after") and for a plain class that keeps the same attributes in an
+instance `__dict__` ("before"). The attribute values are shared between all
+instances, so only the overhead of the record itself is measured.
+
+Usage:
+    python bench_memory.py [n_instances]
+"""
+from __future__ import annotations
+
+import sys
+import tracemalloc
+from typing import Any
+from typing import Callable
+
+import day03
+import day04
+import day10
+import day11
+import day15
+import day16_utils
+import day21
+import day22
+import day23
+from utils import Offsets
+
+# A sample instance of each class, used as template for the attribute values
+SAMPLES: list[Any] = [
+    day03.GridNumber(value=467, row=0, cols=[0, 1, 2]),
+    day03.Symbol(value="*", row=1, col=3, mask=day03._get_mask_around_symbol(1, 3)),
+    day04.get_scratch_card_from_line(day04.INPUT1),
+    day10.Node(1, 2, "|"),
+    day11.Node(1, 2, "#"),
+    day15.Step("rn", "=", 1),
+    day16_utils.Lightbeam(0, 0, Offsets.EAST),
+    day21.Node(0, 0, "."),
+    day22.Brick((1, 1), (0, 2), (1, 1)),
+    day23.Node(1, 0, ".", is_start=True),
+]
+
+
+def _factories(sample: Any) -> tuple[Callable[[], Any], Callable[[], Any]]:
+    """
+    Return factories that create a copy of the sample without and with
+    `__slots__`.
+    """
+    cls = type(sample)
+    values = [(name, getattr(sample, name)) for name in cls.__slots__]
+
+    # Plain class with the same attributes stored in the instance __dict__
+    dict_cls = type(f"{cls.__name__}Dict", (), {})
+
+    def before() -> Any:
+        obj = dict_cls()
+        for name, value in values:
+            object.__setattr__(obj, name, value)
+        return obj
+
+    def after() -> Any:
+        # bypass __init__, since some classes compute values or are frozen
+        obj = object.__new__(cls)
+        for name, value in values:
+            object.__setattr__(obj, name, value)
+        return obj
+
+    return before, after
+
+
+def bytes_per_instance(factory: Callable[[], Any], n: int) -> float:
+    """ Measure the average allocated bytes per instance created by factory """
+    objs: list[Any] = [None] * n
+
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    for idx in range(n):
+        objs[idx] = factory()
+    end, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return (end - start) / n
+
+
+def main() -> None:
+    """ Print the bytes per instance before and after for every class """
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    print(f"{'class':<28} {'before':>8} {'after':>8}")
+    for sample in SAMPLES:
+        before, after = _factories(sample)
+        name = f"{type(sample).__module__}.{type(sample).__name__}"
+        print(
+            f"{name:<28} "
+            f"{bytes_per_instance(before, n):8.1f} "
+            f"{bytes_per_instance(after, n):8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
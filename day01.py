@@ -1,4 +1,12 @@
-import re
+import logging
+import mmap
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable
+from typing import Mapping
+from typing import Optional
+from typing import Sequence
 
 INPUT1 = """\
 1abc2
@@ -27,65 +35,229 @@ sevenine
 
 EXPECTED3 = 79
 
-DEBUG = True
+logger = logging.getLogger(__name__)
+
+
+# Vocabulary of the patterns that represent a digit
+DIGITS = {str(d): d for d in range(1, 10)}
+DIGIT_WORDS = {
+    **DIGITS,
+    "one": 1,
+    "two": 2,
+    "three": 3,
+    "four": 4,
+    "five": 5,
+    "six": 6,
+    "seven": 7,
+    "eight": 8,
+    "nine": 9,
+}
+
+
+class _Automaton:
+    """
+    Aho-Corasick automaton over a set of patterns.
+
+    Every state stores the longest pattern that is a suffix of the text
+    matched so far, as (length, value).
+    """
+
+    def __init__(self, patterns: Iterable[tuple[Sequence, int]]):
+        self.goto: list[dict] = [{}]
+        self.out: list[Optional[tuple[int, int]]] = [None]
+
+        # Build the trie
+        for pattern, value in patterns:
+            state = 0
+            for symbol in pattern:
+                if symbol not in self.goto[state]:
+                    self.goto.append({})
+                    self.out.append(None)
+                    self.goto[state][symbol] = len(self.goto) - 1
+                state = self.goto[state][symbol]
+            self.out[state] = (len(pattern), value)
+
+        # Compute the failure links breadth first, so the failure state
+        # of a state is always finished before the state itself
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for symbol, child in self.goto[state].items():
+                fail = self.fail[state]
+                while fail and symbol not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[child] = self.goto[fail].get(symbol, 0)
+
+                if self.out[child] is None:
+                    self.out[child] = self.out[self.fail[child]]
+                queue.append(child)
+
+    def step(self, state: int, symbol) -> int:
+        """ Return the next state after reading symbol """
+        goto = self.goto
+        fail = self.fail
+        while state and symbol not in goto[state]:
+            state = fail[state]
+        return goto[state].get(symbol, 0)
+
+
+class DigitScanner:
+    """
+    Finds the first and last digit in a line in a single partial scan each.
+
+    The first digit is found by scanning forward until the first match,
+    the last digit by scanning the line backwards with an automaton over the
+    reversed patterns. Works on `str` as well as `bytes` patterns and lines.
+    """
+
+    def __init__(self, vocabulary: Mapping[Sequence, int]):
+        self.max_len = max(len(pattern) for pattern in vocabulary)
+        self._forward = _Automaton(vocabulary.items())
+        self._backward = _Automaton((p[::-1], v) for p, v in vocabulary.items())
+
+    def first(self, line: Sequence) -> Optional[int]:
+        """ Return the value of the match that starts first in the line """
+        automaton = self._forward
+        best_start = len(line)
+        best = None
+
+        state = 0
+        for idx, symbol in enumerate(line):
+            if best is not None and idx - self.max_len + 1 >= best_start:
+                # No match ending from here on can start before the best one
+                break
+
+            state = automaton.step(state, symbol)
+            match = automaton.out[state]
+
+            if match is not None and idx - match[0] + 1 < best_start:
+                best_start = idx - match[0] + 1
+                best = match[1]
+
+        return best
+
+    def last(self, line: Sequence) -> Optional[int]:
+        """ Return the value of the match that starts last in the line """
+        automaton = self._backward
+
+        # The first match when reading backwards is the one that starts last
+        state = 0
+        for idx in range(len(line) - 1, -1, -1):
+            state = automaton.step(state, line[idx])
+            match = automaton.out[state]
+
+            if match is not None:
+                return match[1]
 
+        return None
 
-def _find_minmax_index_of_all_matches(line: str, pattern: str) -> list[int]:
-    indexes = []
 
-    for m in re.finditer(pattern, line):
-        indexes.append(m.start())
+SCANNER = DigitScanner(DIGIT_WORDS)
+BYTES_SCANNER = DigitScanner({k.encode(): v for k, v in DIGIT_WORDS.items()})
+
 
-    if indexes:
-        return (min(indexes), max(indexes))
-    else:
-        return (len(line)+1, -1)
+def get_coordinates_from_line(line: str, scanner: DigitScanner = SCANNER) -> int:
+    first = scanner.first(line)
+    last = scanner.last(line)
 
-def get_coordinates_from_line(line: str):
-    first_match = len(line) + 1
-    last_match = -1
+    if first is None or last is None:
+        raise ValueError(f"No digit found in line '{line}'")
+
+    return 10 * first + last
 
-    patterns = {
-        "1": r"1|one",
-        "2": r"2|two",
-        "3": r"3|three",
-        "4": r"4|four",
-        "5": r"5|five",
-        "6": r"6|six",
-        "7": r"7|seven",
-        "8": r"8|eight",
-        "9": r"9|nine",
-    }
 
-    for key, pattern in patterns.items():
-        min_idx, max_idx = _find_minmax_index_of_all_matches(line, pattern)
+def compute(input_str: str) -> int:
+    # Check the log level once, so the loop doesn't format anything
+    # when debugging is off
+    debug = logger.isEnabledFor(logging.DEBUG)
+
+    total = 0
+    for line in input_str.splitlines():
+        coord = get_coordinates_from_line(line)
+        total += coord
 
-        if min_idx < first_match:
-            first_match = min_idx
-            first_num = key
+        if debug:
+            logger.debug("line=%r coord=%d total=%d", line, coord, total)
 
-        if max_idx > last_match:
-            last_match = max_idx
-            last_num = key
+    return total
 
-    return int(first_num + last_num)
 
+def _split_byte_ranges(data: mmap.mmap, n_ranges: int) -> list[tuple[int, int]]:
+    """
+    Split the data in about n_ranges byte ranges (start, end) that each
+    end right after a newline (or at the end of the data).
+    """
+    size = len(data)
+    ranges = []
+    start = 0
+
+    for idx in range(1, n_ranges + 1):
+        if start >= size:
+            break
+
+        end = data.find(b"\n", max(start, idx * size // n_ranges - 1))
+        end = size if end < 0 or idx == n_ranges else end + 1
+        ranges.append((start, end))
+        start = end
+
+    return ranges
+
+
+def _compute_byte_range(path: str, start: int, end: int) -> int:
+    """ Sum the calibration values of the lines in a byte range of the file """
+    debug = logger.isEnabledFor(logging.DEBUG)
 
-def compute(input_str: str) -> int:
     total = 0
-    for line in input_str.splitlines():
-        if DEBUG:
-            print(f"{line=}")
-        coord = get_coordinates_from_line(line)
-        total += coord
+    with open(path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    with data:
+        pos = start
+        while pos < end:
+            newline = data.find(b"\n", pos, end)
+            line_end = end if newline < 0 else newline
+            line = data[pos:line_end].rstrip(b"\r")
+            pos = line_end + 1
+
+            if not line:
+                continue
+
+            coord = get_coordinates_from_line(line, BYTES_SCANNER)
+            total += coord
 
-        if DEBUG:
-            print(f"{coord=}")
-            print(f"{total=}")
+            if debug:
+                logger.debug("line=%r coord=%d total=%d", line, coord, total)
 
     return total
 
 
+def compute_file(path: str, workers: Optional[int] = None) -> int:
+    """
+    Compute the result for a (huge) file. The file is memory mapped and
+    split in newline aligned byte ranges, which are processed in parallel
+    by worker processes.
+    """
+    workers = workers or os.cpu_count() or 1
+
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return 0
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            # A few ranges per worker, to balance the work
+            ranges = _split_byte_ranges(data, 4 * workers)
+
+    with ProcessPoolExecutor(workers) as executor:
+        totals = executor.map(
+            _compute_byte_range,
+            [path] * len(ranges),
+            [start for start, _ in ranges],
+            [end for _, end in ranges],
+        )
+        return sum(totals)
+
+
 def test_case1():
     assert compute(INPUT1) == EXPECTED1
 
@@ -98,11 +270,46 @@ def test_case3():
     assert compute(INPUT3) == EXPECTED3
 
 
+def test_digits_only_vocabulary():
+    assert get_coordinates_from_line("two1nine", DigitScanner(DIGITS)) == 11
+
+
+def test_first_match_by_start():
+    # "bc" is the first match to end, but "abcde" starts earlier
+    scanner = DigitScanner({"abcde": 1, "bc": 2, "e": 3})
+    assert get_coordinates_from_line("xabcdex", scanner) == 13
+
+
+def test_bytes_line():
+    scanner = DigitScanner({k.encode(): v for k, v in DIGIT_WORDS.items()})
+    assert get_coordinates_from_line(b"xtwone3four", scanner) == 24
+
+
+def test_compute_file(tmp_path):
+    path = tmp_path / "input.txt"
+    path.write_text(50 * INPUT2)
+    assert compute_file(str(path), workers=2) == 50 * EXPECTED2
+
+
+def test_split_byte_ranges(tmp_path):
+    path = tmp_path / "input.txt"
+    path.write_bytes(INPUT2.encode())
+
+    with open(path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    with data:
+        ranges = _split_byte_ranges(data, 5)
+        lines = [data[start:end] for start, end in ranges]
+
+    assert b"".join(lines) == INPUT2.encode()
+    assert all(line.endswith(b"\n") for line in lines)
+
+
 def main():
-    with open("day1_1_input.txt", "r") as f:
-        data = f.read()
+    logging.basicConfig(level=logging.INFO)
 
-    total = compute(data)
+    total = compute_file("day1_1_input.txt")
     print(total)
 
 
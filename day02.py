@@ -1,5 +1,10 @@
+import random
 import re
+from array import array
+from bisect import bisect_right
 from dataclasses import dataclass
+from dataclasses import field
+from typing import Iterable
 
 INPUT1 = """\
 Game 1: 3 blue, 4 red; 1 red, 2 green, 6 blue; 2 green
@@ -90,19 +95,159 @@ def parse_game(line: str) -> Game:
     return Game(idx, samples)
 
 
-def compute(data: str) -> int:
-    games = [parse_game(line) for line in data.splitlines()]
+@dataclass
+class GameColumns:
+    """
+    Per game maxima of the cube colours, stored column wise in compact
+    arrays instead of a Game object per game.
+    """
+    ids: array = field(default_factory=lambda: array("I"))
+    red: array = field(default_factory=lambda: array("H"))
+    green: array = field(default_factory=lambda: array("H"))
+    blue: array = field(default_factory=lambda: array("H"))
 
-    valid_games = [game for game in games if game.is_valid_game]
+    def append(self, idx: int, red: int, green: int, blue: int) -> None:
+        self.ids.append(idx)
+        self.red.append(red)
+        self.green.append(green)
+        self.blue.append(blue)
 
-    #  for game in valid_games:
-    #     print(game)
-    return sum([game.idx for game in valid_games])
+    def __len__(self) -> int:
+        return len(self.ids)
 
-def compute2(data: str) -> int:
-    games = [parse_game(line) for line in data.splitlines()]
 
-    return sum([game.power for game in games])
+RE_CUBES = re.compile(r"(\d+) (red|green|blue)")
+
+
+def parse_game_maxima(line: str) -> tuple[int, int, int, int]:
+    """ Reduce a game line to (idx, max_red, max_green, max_blue) """
+    idx_str, samples_str = line.split(":")
+
+    maxima = {"red": 0, "green": 0, "blue": 0}
+    for n, color in RE_CUBES.findall(samples_str):
+        if int(n) > maxima[color]:
+            maxima[color] = int(n)
+
+    return (
+        _get_game_idx_from_string(idx_str),
+        maxima["red"],
+        maxima["green"],
+        maxima["blue"],
+    )
+
+
+def parse_games(lines: Iterable[str]) -> GameColumns:
+    """ Stream the game lines into the per game maxima columns """
+    columns = GameColumns()
+    for line in lines:
+        columns.append(*parse_game_maxima(line))
+    return columns
+
+
+def summarise_games(
+        columns: GameColumns,
+        n_cubes: dict[str, int] = N_CUBES,
+        ) -> tuple[int, int]:
+    """
+    Compute both parts in one pass over the columns.
+    Returns the sum of the ids of the valid games and the sum of the powers.
+    """
+    max_red = n_cubes["red"]
+    max_green = n_cubes["green"]
+    max_blue = n_cubes["blue"]
+
+    id_sum = 0
+    power_sum = 0
+    for idx, red, green, blue in zip(
+            columns.ids, columns.red, columns.green, columns.blue
+            ):
+        if red <= max_red and green <= max_green and blue <= max_blue:
+            id_sum += idx
+        power_sum += red * green * blue
+
+    return id_sum, power_sum
+
+
+class CubeIndex:
+    """
+    Index over the per game maxima to answer "which games are possible with
+    (red, green, blue) cubes" queries without rescanning all games.
+
+    The distinct maxima of each colour are sorted (coordinate compression).
+    A cumulative table holds, for every combination of compressed red, green
+    and blue values, the number of games and the sum of their ids for games
+    that have all maxima at or below those values. A query is then three
+    bisects and a table lookup.
+
+    The table has one entry per combination of distinct maxima, which is
+    small since cube counts are small.
+    """
+
+    def __init__(self, columns: GameColumns):
+        self.reds = sorted(set(columns.red))
+        self.greens = sorted(set(columns.green))
+        self.blues = sorted(set(columns.blue))
+
+        n_red = len(self.reds)
+        n_green = len(self.greens)
+        n_blue = len(self.blues)
+        self._strides = (n_green * n_blue, n_blue)
+
+        counts = [0] * (n_red * n_green * n_blue)
+        id_sums = [0] * (n_red * n_green * n_blue)
+
+        red_idx = {v: i for i, v in enumerate(self.reds)}
+        green_idx = {v: i for i, v in enumerate(self.greens)}
+        blue_idx = {v: i for i, v in enumerate(self.blues)}
+        for idx, red, green, blue in zip(
+                columns.ids, columns.red, columns.green, columns.blue
+                ):
+            cell = self._cell(red_idx[red], green_idx[green], blue_idx[blue])
+            counts[cell] += 1
+            id_sums[cell] += idx
+
+        # Cumulative sums along the red, green and blue axis
+        size = len(counts)
+        for table in (counts, id_sums):
+            for cell in range(self._strides[0], size):
+                table[cell] += table[cell - self._strides[0]]
+            for cell in range(size):
+                if cell // n_blue % n_green:
+                    table[cell] += table[cell - n_blue]
+            for cell in range(size):
+                if cell % n_blue:
+                    table[cell] += table[cell - 1]
+
+        self._counts = counts
+        self._id_sums = id_sums
+
+    def _cell(self, ri: int, gi: int, bi: int) -> int:
+        """ Index in the flat table """
+        return ri * self._strides[0] + gi * self._strides[1] + bi
+
+    def query(self, red: int, green: int, blue: int) -> tuple[int, int]:
+        """
+        Return the number of games and the sum of their ids that are possible
+        with the given number of cubes.
+        """
+        ri = bisect_right(self.reds, red) - 1
+        gi = bisect_right(self.greens, green) - 1
+        bi = bisect_right(self.blues, blue) - 1
+
+        if ri < 0 or gi < 0 or bi < 0:
+            return 0, 0
+
+        cell = self._cell(ri, gi, bi)
+        return self._counts[cell], self._id_sums[cell]
+
+
+def compute(data: str) -> int:
+    id_sum, _ = summarise_games(parse_games(data.splitlines()))
+    return id_sum
+
+def compute2(data: str) -> int:
+    _, power_sum = summarise_games(parse_games(data.splitlines()))
+    return power_sum
 
 def test_case1():
     assert compute(INPUT1) == EXPECTED1
@@ -111,14 +256,42 @@ def test_case2():
     # same input as test case 1
     assert compute2(INPUT1) == EXPECTED2
 
+def test_columns_match_games():
+    columns = parse_games(INPUT1.splitlines())
+    games = [parse_game(line) for line in INPUT1.splitlines()]
+
+    assert list(columns.ids) == [game.idx for game in games]
+    assert list(columns.red) == [game.max_red for game in games]
+    assert list(columns.green) == [game.max_green for game in games]
+    assert list(columns.blue) == [game.max_blue for game in games]
+
+def test_cube_index():
+    rng = random.Random(2)
+    columns = GameColumns()
+    for idx in range(1, 200):
+        columns.append(idx, *(rng.randint(0, 20) for _ in range(3)))
+    index = CubeIndex(columns)
+
+    games = list(zip(columns.ids, columns.red, columns.green, columns.blue))
+    for _ in range(200):
+        red, green, blue = (rng.randint(-1, 22) for _ in range(3))
+        possible = [
+            idx
+            for idx, r, g, b in games
+            if r <= red and g <= green and b <= blue
+        ]
+        assert index.query(red, green, blue) == (len(possible), sum(possible))
+
+def test_cube_index_example():
+    index = CubeIndex(parse_games(INPUT1.splitlines()))
+    assert index.query(**N_CUBES) == (3, EXPECTED1)
+
 def main() -> int:
     with open("day2_input.txt", "r") as f:
-        data = f.read()
+        columns = parse_games(f)
 
-    total = compute(data)
+    total, power = summarise_games(columns)
     print(f"{total=}")
-
-    power = compute2(data)
     print(f"{power=}")
 
 if __name__ == "__main__":
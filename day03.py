@@ -1,9 +1,12 @@
 """ Advent of Code 2023 day3 """
 from __future__ import annotations
 
+import random
 import re
+from collections import deque
 from dataclasses import dataclass
 from dataclasses import field
+from typing import Iterable
 
 INPUT1 = """\
 467..114..
@@ -29,7 +32,42 @@ def test_case2():
     """ test day3 part 2"""
     assert compute2(INPUT1) == EXPECTED2
 
-@dataclass
+def test_streaming():
+    """ test computing both parts with a window of three rows """
+    assert compute_streaming(INPUT1.splitlines()) == (EXPECTED1, EXPECTED2)
+
+def test_streaming_single_row():
+    """ test streaming a schematic of a single row """
+    assert compute_streaming(["12*3.4#"]) == (19, 36)
+
+def test_schematic():
+    """ test the totals of a schematic without edits """
+    schematic = Schematic(INPUT1)
+    assert (schematic.part_sum, schematic.gear_sum) == (EXPECTED1, EXPECTED2)
+
+def test_schematic_edits():
+    """ test that the totals stay correct while editing random cells """
+    rng = random.Random(3)
+    schematic = Schematic(INPUT1)
+
+    for _ in range(500):
+        row = rng.randrange(len(schematic.grid))
+        col = rng.randrange(len(schematic.grid[row]))
+        schematic.set_cell(row, col, rng.choice("....0123456789*#"))
+
+        data = "\n".join("".join(line) for line in schematic.grid)
+        assert schematic.part_sum == compute(data)
+        assert schematic.gear_sum == compute2(data)
+
+def test_adjacent_number_ids():
+    """ test lookup of the numbers around a symbol """
+    numbers, symbols = _parse_schematic(INPUT1)
+    index = build_number_index(numbers)
+
+    adj = get_adjacent_number_ids(symbols[0], index)
+    assert sorted(numbers[idx].value for idx in adj) == [35, 467]
+
+@dataclass(slots=True)
 class Symbol:
     """ Dataclass for symbol in grid """
     value: str
@@ -42,7 +80,7 @@ class Symbol:
         """ return True if gridnumber adjacent to this Symbol """
         return any([c in self.mask for c in num.coords])
 
-@dataclass
+@dataclass(slots=True)
 class GridNumber:
     """ Dataclass for number in grid """
     value: int  # the actual value
@@ -95,38 +133,275 @@ def get_numbers_around_symbol(s: Symbol, numbers: list[GridNumber]) -> list[Grid
     """ Returns a list of GridNumbers which are adjacent to the Symbol. """
     return [n for n in numbers if s.is_num_adj(n)]
 
-def compute(data: str) -> int:
-    """ compute function to run day 3 part 1 """
+def build_number_index(numbers: list[GridNumber]) -> dict[tuple[int, int], int]:
+    """
+    Returns a map of the grid coordinates of every digit to the index of
+    the GridNumber it belongs to.
+    """
+    return {coord: idx for idx, n in enumerate(numbers) for coord in n.coords}
+
+def get_adjacent_number_ids(
+        s: Symbol,
+        index: dict[tuple[int, int], int],
+        ) -> set[int]:
+    """ Returns the indexes of the GridNumbers adjacent to the Symbol """
+    return {index[c] for c in s.mask if c in index}
+
+def _parse_schematic(data: str) -> tuple[list[GridNumber], list[Symbol]]:
+    """ Returns all GridNumbers and Symbols in the schematic """
     numbers: list[GridNumber] = []
     symbols: list[Symbol] = []
     for rown, line in enumerate(data.splitlines()):
         numbers += _read_numbers_from_line(line, rown)
         symbols += _read_symbols_from_line(line, rown)
 
-    valid_numbers = [n for n in numbers if n.is_valid(symbols)]
+    return numbers, symbols
+
+def compute(data: str) -> int:
+    """ compute function to run day 3 part 1 """
+    numbers, symbols = _parse_schematic(data)
+    index = build_number_index(numbers)
+
+    valid_ids: set[int] = set()
+    for s in symbols:
+        valid_ids |= get_adjacent_number_ids(s, index)
 
-    return sum([x.value for x in valid_numbers])
+    return sum(numbers[idx].value for idx in valid_ids)
 
 def compute2(data: str) -> int:
     """ compute function to run day 3 part 2 """
-    numbers: list[GridNumber] = []
-    symbols: list[Symbol] = []
-    for rown, line in enumerate(data.splitlines()):
-        numbers += _read_numbers_from_line(line, rown)
-        symbols += _read_symbols_from_line(line, rown)
+    numbers, symbols = _parse_schematic(data)
+    index = build_number_index(numbers)
+
+    total = 0
+    for s in symbols:
+        adj = [numbers[idx].value for idx in get_adjacent_number_ids(s, index)]
+        if len(adj) == 2:
+            total += adj[0] * adj[1]
+
+    return total
+
+Row = tuple[list[GridNumber], list[Symbol]]
+
+def _evaluate_row(center: Row, window: list[Row]) -> tuple[int, int]:
+    """
+    Returns the sum of the part numbers and the sum of the gear ratios of the
+    center row. The window holds the center row and the rows around it.
+    """
+    numbers = [n for row_numbers, _ in window for n in row_numbers]
+    index = build_number_index(numbers)
+    symbol_coords = {(s.col, s.row) for _, row_symbols in window for s in row_symbols}
+
+    part_sum = 0
+    for n in center[0]:
+        around = (
+            (x, y)
+            for y in range(n.row - 1, n.row + 2)
+            for x in range(n.cols[0] - 1, n.cols[-1] + 2)
+        )
+        if any(c in symbol_coords for c in around):
+            part_sum += n.value
+
+    gear_sum = 0
+    for s in center[1]:
+        adj = [numbers[idx].value for idx in get_adjacent_number_ids(s, index)]
+        if len(adj) == 2:
+            gear_sum += adj[0] * adj[1]
+
+    return part_sum, gear_sum
+
+def compute_streaming(lines: Iterable[str]) -> tuple[int, int]:
+    """
+    Compute both parts while streaming over the rows of the schematic.
+
+    Adjacency only spans three rows, so only a window of the previous,
+    current and next row is kept. A row is evaluated as soon as the next row
+    is read, so memory is O(width) regardless of the schematic height.
+
+    Returns the sum of the part numbers and the sum of the gear ratios.
+    """
+    window: deque[Row] = deque(maxlen=3)
+    part_sum = 0
+    gear_sum = 0
 
-    adj = [get_numbers_around_symbol(s, numbers) for s in symbols]
+    for rown, line in enumerate(lines):
+        line = line.rstrip("\n")
+        window.append(
+            (_read_numbers_from_line(line, rown), _read_symbols_from_line(line, rown))
+        )
+
+        if len(window) > 1:
+            # All neighbours of the second to last row are known
+            parts, gears = _evaluate_row(window[-2], list(window))
+            part_sum += parts
+            gear_sum += gears
+
+    if window:
+        # The last row only has a previous row
+        parts, gears = _evaluate_row(window[-1], list(window)[-2:])
+        part_sum += parts
+        gear_sum += gears
+
+    return part_sum, gear_sum
+
+def _is_symbol(ch: str) -> bool:
+    """ Return True if the character is a symbol """
+    return not ch.isdigit() and ch != "."
+
+class Schematic:
+    """
+    Schematic that keeps the sum of the part numbers and the sum of the gear
+    ratios up to date while cells are edited.
+
+    Every number has an id, and the id of the number is stored for each of
+    its digit cells. The contribution of every number (its value if it is a
+    part number) and every symbol (its gear ratio) to the totals is kept, so
+    an edit only has to refresh the numbers and symbols around the cell.
+    """
+
+    def __init__(self, data: str):
+        self.grid = [list(line) for line in data.splitlines()]
+
+        self._next_id = 0
+        # number id -> (row, start col, end col (exclusive))
+        self._numbers: dict[int, tuple[int, int, int]] = {}
+        self._number_at: dict[tuple[int, int], int] = {}
+
+        self._part_contrib: dict[int, int] = {}
+        self._gear_contrib: dict[tuple[int, int], int] = {}
+        self.part_sum = 0
+        self.gear_sum = 0
+
+        for row, line in enumerate(self.grid):
+            for nid in self._add_numbers(row, 0, len(line)):
+                self._refresh_number(nid)
+
+        for row, line in enumerate(self.grid):
+            for col, ch in enumerate(line):
+                if _is_symbol(ch):
+                    self._refresh_symbol(row, col)
+
+    def _in_grid(self, row: int, col: int) -> bool:
+        return 0 <= row < len(self.grid) and 0 <= col < len(self.grid[row])
+
+    def _add_numbers(self, row: int, start: int, end: int) -> list[int]:
+        """ Add the digit runs in row[start:end] as numbers, returns their ids """
+        ids = []
+        line = "".join(self.grid[row][start:end])
+        for m in re.finditer(r"\d+", line):
+            nid = self._next_id
+            self._next_id += 1
+            self._numbers[nid] = (row, start + m.start(), start + m.end())
+            for col in range(start + m.start(), start + m.end()):
+                self._number_at[(row, col)] = nid
+            ids.append(nid)
+        return ids
+
+    def _remove_number(self, nid: int) -> None:
+        """ Remove a number and its contribution to the part sum """
+        row, start, end = self._numbers.pop(nid)
+        for col in range(start, end):
+            del self._number_at[(row, col)]
+        self.part_sum -= self._part_contrib.pop(nid, 0)
+
+    def _value(self, nid: int) -> int:
+        row, start, end = self._numbers[nid]
+        return int("".join(self.grid[row][start:end]))
 
-    return sum([a[0].value * a[1].value for a in adj if len(a) == 2])
+    def _numbers_around(self, row: int, col: int) -> set[int]:
+        """ Returns the ids of the numbers adjacent to a cell """
+        return {
+            self._number_at[(r, c)]
+            for r in range(row - 1, row + 2)
+            for c in range(col - 1, col + 2)
+            if (r, c) in self._number_at
+        }
+
+    def _symbols_in_box(
+            self,
+            rows: range,
+            cols: range,
+            ) -> list[tuple[int, int]]:
+        """ Returns the coordinates of the symbols in a box of the grid """
+        return [
+            (r, c)
+            for r in rows
+            for c in cols
+            if self._in_grid(r, c) and _is_symbol(self.grid[r][c])
+        ]
+
+    def _refresh_number(self, nid: int) -> None:
+        """ Recompute the contribution of a number to the part sum """
+        self.part_sum -= self._part_contrib.pop(nid, 0)
+
+        row, start, end = self._numbers[nid]
+        if self._symbols_in_box(range(row - 1, row + 2), range(start - 1, end + 1)):
+            self._part_contrib[nid] = self._value(nid)
+            self.part_sum += self._part_contrib[nid]
+
+    def _refresh_symbol(self, row: int, col: int) -> None:
+        """ Recompute the contribution of a symbol to the gear sum """
+        self._remove_symbol(row, col)
+
+        if not _is_symbol(self.grid[row][col]):
+            return
+
+        adj = [self._value(nid) for nid in self._numbers_around(row, col)]
+        if len(adj) == 2:
+            self._gear_contrib[(row, col)] = adj[0] * adj[1]
+            self.gear_sum += self._gear_contrib[(row, col)]
+
+    def _remove_symbol(self, row: int, col: int) -> None:
+        """ Remove the contribution of a symbol to the gear sum """
+        self.gear_sum -= self._gear_contrib.pop((row, col), 0)
+
+    def set_cell(self, row: int, col: int, ch: str) -> None:
+        """
+        Change a cell of the schematic and update the totals.
+
+        Only the digit runs in the row around the cell are parsed again
+        (merging or splitting numbers), and only the numbers and symbols
+        around those are refreshed.
+        """
+        if len(ch) != 1:
+            raise ValueError(f"Expected a single character, got '{ch}'")
+        if not self._in_grid(row, col):
+            raise IndexError(f"Cell ({row}, {col}) is outside the schematic")
+        if self.grid[row][col] == ch:
+            return
+
+        # The numbers in this row next to the cell can merge or split,
+        # remove them and parse the region they cover again after the edit
+        start = col
+        end = col + 1
+        for nid in self._numbers_around(row, col):
+            nrow, nstart, nend = self._numbers[nid]
+            if nrow == row:
+                start = min(start, nstart)
+                end = max(end, nend)
+                self._remove_number(nid)
+
+        # Symbols whose adjacent numbers can change
+        box = (range(row - 1, row + 2), range(start - 1, end + 1))
+        for r, c in self._symbols_in_box(*box):
+            self._remove_symbol(r, c)
+
+        self.grid[row][col] = ch
+        new_ids = self._add_numbers(row, start, end)
+
+        # Whether the cell is a symbol changes the part status of the
+        # numbers around it
+        for nid in self._numbers_around(row, col) | set(new_ids):
+            self._refresh_number(nid)
+
+        for r, c in self._symbols_in_box(*box):
+            self._refresh_symbol(r, c)
 
 def main() -> None:
     with open("day3_input.txt", "r") as f:
-        data = f.read()
+        total, total2 = compute_streaming(f)
 
-    total = compute(data)
     print(f"{total=}")
-
-    total2 = compute2(data)
     print(f"{total2=}")
 
 if __name__ == "__main__":
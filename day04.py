@@ -1,6 +1,9 @@
 """ Advent of Code 2023 day 4"""
 import re
+from collections import deque
 from dataclasses import dataclass
+from dataclasses import field
+from typing import Iterable
 
 from utils import get_integers_from_line
 
@@ -87,6 +90,13 @@ def test_case7():
     assert compute2(INPUT7) == EXPECTED7
 
 
+def test_scoring_numbers():
+    """ Test the scoring numbers are found from the bitmasks """
+    card = get_scratch_card_from_line(INPUT1)
+    assert card.scoring_numbers == [17, 48, 83, 86]
+    assert card.n_scoring == 4
+
+
 def test_case8():
     """
     Test case part 2. Worst case scenario all winners. (for performance)
@@ -94,12 +104,30 @@ def test_case8():
     assert compute2(INPUT8) == EXPECTED8
 
 
-@dataclass
+def _to_bitmask(numbers: list[int]) -> int:
+    """ Returns an integer with the bit of every number set """
+    mask = 0
+    for x in numbers:
+        mask |= 1 << x
+    return mask
+
+
+@dataclass(slots=True)
 class ScratchCard:
-    """ Representation of a ScratchCard """
+    """
+    Representation of a ScratchCard
+
+    The winning and selected numbers are stored as bitmasks, so the number
+    of scoring numbers is the number of bits set in both. It is computed once
+    when the card is created. (A number selected twice only counts once.)
+    """
     id: int
-    win_nums: list[int]
-    sel_nums: list[int]
+    win_mask: int
+    sel_mask: int
+    n_scoring: int = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.n_scoring = (self.win_mask & self.sel_mask).bit_count()
 
     @property
     def scoring_numbers(self) -> list[int]:
@@ -107,21 +135,15 @@ class ScratchCard:
         Returns the list of selected numbers that are also
         winning numbers
         """
-        return [x for x in self.sel_nums if x in self.win_nums]
+        mask = self.win_mask & self.sel_mask
+        return [x for x in range(mask.bit_length()) if mask >> x & 1]
 
     @property
     def score(self) -> int:
         """ Returns the score of the ScratchCard"""
-        if not self.scoring_numbers:
-            score = 0
-        else:
-            score = 2 ** (self.n_scoring - 1)
-        return score
-
-    @property
-    def n_scoring(self) -> int:
-        """ returns the number of scoring numbers """
-        return len(self.scoring_numbers)
+        if not self.n_scoring:
+            return 0
+        return 2 ** (self.n_scoring - 1)
 
 
 def get_scratch_card_from_line(line: str) -> ScratchCard:
@@ -135,7 +157,7 @@ def get_scratch_card_from_line(line: str) -> ScratchCard:
     win_num = get_integers_from_line(split_line[1])
     sel_num = get_integers_from_line(split_line[2])
 
-    return ScratchCard(card_idx[0], win_num, sel_num)
+    return ScratchCard(card_idx[0], _to_bitmask(win_num), _to_bitmask(sel_num))
 
 
 def compute(data: str) -> int:
@@ -149,29 +171,45 @@ def compute(data: str) -> int:
     return total_score
 
 
-def compute2(data: str) -> int:
-    """ Compute the result of part 2 """
-    cards = [
-        get_scratch_card_from_line(line)
-        for line in data.splitlines()
-        ]
+def count_cards(lines: Iterable[str]) -> int:
+    """
+    Count the total number of scratch cards while streaming over the cards.
+
+    A card with n scoring numbers adds its number of occurences to each of
+    the next n cards. Instead of updating those n cards, this is stored in a
+    difference array of the upcoming cards: +occurences at the next card and
+    -occurences after the last card it wins. The extra occurences of a card
+    are then the running sum of the differences.
+
+    This is O(number of cards), and the difference array is never longer
+    than the maximum number of scoring numbers + 1.
+    """
+    pending: deque[int] = deque()
+    n_won = 0
+    total = 0
+
+    for line in lines:
+        card = get_scratch_card_from_line(line)
 
-    # initially start with 1 occurence of each card
-    n_cards = [1 for _ in range(len(cards))]
+        if pending:
+            n_won += pending.popleft()
+
+        # initially 1 occurence of each card, plus the won copies
+        n_cards = 1 + n_won
+        total += n_cards
 
-    for idx, card in enumerate(cards):
         if card.n_scoring:
-            # Get the start and end index of the slice of the n_cards
-            # array we need to update
-            start_idx = idx + 1
-            end_idx = min(idx + card.n_scoring + 1, len(cards))
-            for idx2 in range(start_idx, end_idx):
-                # Based on the number of occurences of the current card,
-                # We can add how many times it will add subsequent cards
-                n_cards[idx2] += n_cards[idx]
-
-    # return the sum of occurences of each scratch card
-    return sum(n_cards)
+            while len(pending) <= card.n_scoring:
+                pending.append(0)
+            pending[0] += n_cards
+            pending[card.n_scoring] -= n_cards
+
+    return total
+
+
+def compute2(data: str) -> int:
+    """ Compute the result of part 2 """
+    return count_cards(data.splitlines())
 
 
 def main() -> None:
@@ -1,11 +1,29 @@
 """ Advent of Code 2023 day 5 """
+import functools
+import heapq
+import random
 import re
+from array import array
+from bisect import bisect_left
+from bisect import bisect_right
 from dataclasses import dataclass
 from dataclasses import field
+from typing import Any
+from typing import Generator
+from typing import Iterable
 from typing import Optional
 
+import pytest
+
+from harness import check_engines
+from harness import register
 from utils import get_integers_from_line
 
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, the batch lookups fall back to array
+    np = None
+
 INPUT1 = """\
 seeds: 79 14 55 13
 
@@ -44,6 +62,12 @@ humidity-to-location map:
 EXPECTED1 = 35
 EXPECTED2 = 46
 
+MAPNAMES = [
+    "seed-to-soil", "soil-to-fertilizer", "fertilizer-to-water",
+    "water-to-light", "light-to-temperature", "temperature-to-humidity",
+    "humidity-to-location"
+]
+
 
 def test_case1():
     """ Test example data given """
@@ -55,36 +79,190 @@ def test_case2():
     assert compute2(INPUT1) == EXPECTED2
 
 
+def test_composed_map():
+    """ Test that the composed map gives the same locations as the chain """
+    almanac = parse_almanac(INPUT1)
+
+    for seed in range(-5, 120):
+        location = seed
+        for name in MAPNAMES:
+            location = almanac.maps[name].get_dest(location)
+
+        assert almanac.get_location(seed) == location
+
+
+def test_range_fragments_are_merged():
+    """ Test that overlapping seed ranges don't multiply the ranges """
+    seeds, maps = _parse_almanac(INPUT1)
+    seed_ranges = _seed_ranges(seeds) * 100 + [range(x, x + 3) for x in range(100)]
+
+    stats: list[int] = []
+    assert find_min_location_range(seed_ranges, maps, MAPNAMES, stats) == 0
+    assert len(stats) == len(MAPNAMES) + 1
+    assert stats[0] == 1
+    # Each stage can at most split a range on the breakpoints of the map
+    assert max(stats) <= 1 + 2 * sum(len(m.source) for m in maps.values())
+
+
+def test_source_range():
+    """ Test that the inverse lookups match the forward lookups """
+    almanac = parse_almanac(INPUT1)
+    window = range(-5, 120)
+
+    for location in window:
+        expected = [
+            seed for seed in window if almanac.get_location(seed) == location
+            ]
+        seeds = get_source_range_chain(
+            range(location, location + 1), almanac.maps, MAPNAMES
+            )
+
+        assert [x for r in seeds for x in r] == expected
+        assert almanac.get_seeds(range(location, location + 1)) == seeds
+
+
+def test_dest_bands():
+    """ Test that the destination bands are ascending and cover the image """
+    almanac = parse_almanac(INPUT1)
+    bands = list(almanac.composed.dest_bands())
+
+    assert bands == sorted(bands)
+    assert bands[0][0] == MIN_VALUE and bands[-1][1] == MAX_VALUE
+    for seed in range(-5, 120):
+        location = almanac.get_location(seed)
+        assert any(start <= location < end for start, end in bands)
+
+
+def test_map_equality():
+    """ Test that the lookup caches don't take part in comparisons """
+    frozen = AlmanacMap(name="a")
+    unfrozen = AlmanacMap(name="a")
+    for almanac_map in (frozen, unfrozen):
+        almanac_map.add(source=10, dest=20, length=5)
+        almanac_map.add(source=0, dest=30, length=3)
+
+    frozen.freeze()
+    frozen.get_dest_many([1, 12, 40])
+
+    assert frozen == unfrozen
+    if np is not None:
+        # The cached numpy arrays can't be compared with ==
+        frozen.get_dest_many(np.arange(50))
+        unfrozen.get_dest_many(np.arange(50))
+        assert frozen == unfrozen
+
+
+def test_get_dest_many():
+    """ Test the batch lookups against the lookups per seed """
+    almanac = parse_almanac(INPUT1)
+    seeds = list(range(-5, 120))
+    expected = [almanac.get_location(seed) for seed in seeds]
+
+    assert list(almanac.get_locations(seeds)) == expected
+    assert list(
+        get_dest_many_chain(array("q", seeds), almanac.maps, MAPNAMES)
+        ) == expected
+
+
+def test_get_dest_many_numpy():
+    """ Test the numpy batch lookups against the lookups per seed """
+    numpy = pytest.importorskip("numpy")
+    almanac = parse_almanac(INPUT1)
+    seeds = numpy.arange(-5, 120, dtype=numpy.int64)
+    expected = [almanac.get_location(int(seed)) for seed in seeds]
+
+    assert almanac.get_locations(seeds).tolist() == expected
+    assert get_dest_many_chain(seeds, almanac.maps, MAPNAMES).tolist() == expected
+
+
+def test_engines():
+    """ Test that all engines agree with the reference implementation """
+    rng = random.Random(5)
+    for part in (1, 2):
+        check_engines("day05", part, engine_cases(part, rng))
+
+
 @dataclass
 class AlmanacMap:
-    """ Representation of the farming almanac """
+    """
+    Representation of the farming almanac
+
+    After adding all map data, the map is frozen into parallel arrays of the
+    range starts, ends and deltas (dest - source), sorted by start. Lookups
+    then bisect into these arrays.
+    """
     name: str
     _source: list[int] = field(default_factory=list)
     _dest: list[int] = field(default_factory=list)
     _length: list[int] = field(default_factory=list)
 
+    # Caches derived from the map data by `freeze`
+    _starts: list[int] = field(
+        default_factory=list, init=False, compare=False, repr=False
+        )
+    _ends: list[int] = field(
+        default_factory=list, init=False, compare=False, repr=False
+        )
+    _deltas: list[int] = field(
+        default_factory=list, init=False, compare=False, repr=False
+        )
+    _frozen: bool = field(default=False, init=False, compare=False, repr=False)
+    _img_starts: list[int] = field(
+        default_factory=list, init=False, compare=False, repr=False
+        )
+    _img_segments: list[tuple[int, int, int]] = field(
+        default_factory=list, init=False, compare=False, repr=False
+        )
+    _max_length: int = field(default=0, init=False, compare=False, repr=False)
+    _np_arrays: Any = field(default=None, init=False, compare=False, repr=False)
+
     def add(self, source: int, dest: int, length: int) -> None:
         """ Add more map data to the alamanac """
         self._source.append(source)
         self._dest.append(dest)
         self._length.append(length)
+        self._frozen = False
+
+    def freeze(self) -> None:
+        """ Sort the map data into the arrays used for the lookups """
+        ranges = sorted(
+            (s, d, n)
+            for s, d, n in zip(self._source, self._dest, self._length)
+            if n > 0
+            )
+        self._starts = [s for s, _, _ in ranges]
+        self._ends = [s + n for s, _, n in ranges]
+        self._deltas = [d - s for s, d, _ in ranges]
+
+        # The same ranges sorted by destination, for the inverse lookups
+        images = sorted((d, s, s + n, d - s) for s, d, n in ranges)
+        self._img_starts = [d for d, _, _, _ in images]
+        self._img_segments = [(s, e, delta) for _, s, e, delta in images]
+        self._max_length = max((n for _, _, n in ranges), default=0)
+        self._np_arrays = None
+        self._frozen = True
+
+    def _ensure_frozen(self) -> None:
+        if not self._frozen:
+            self.freeze()
 
     @property
     def source(self) -> list[int]:
         """ Return sorted version of sources """
-        return sorted(self._source)
+        self._ensure_frozen()
+        return self._starts
 
     @property
     def dest(self) -> list[int]:
         """ Return dest sorted by source """
-        temp = sorted(zip(self._source, self._dest))
-        return [x for _, x in temp]
+        self._ensure_frozen()
+        return [s + d for s, d in zip(self._starts, self._deltas)]
 
     @property
     def length(self) -> list[int]:
         """ Return length sorted by source """
-        temp = sorted(zip(self._source, self._length))
-        return [x for _, x in temp]
+        self._ensure_frozen()
+        return [e - s for s, e in zip(self._starts, self._ends)]
 
     def _find_idx_in_ranges(self, src: int) -> Optional[int]:
         """
@@ -92,13 +270,13 @@ class AlmanacMap:
         This function returns the index of the range defined by
         self.source[idx]
         """
-        result = None
-        for idx, (x, y) in enumerate(zip(self.source, self.length)):
-            if x <= src <= x + y - 1:
-                result = idx
-                break
+        self._ensure_frozen()
+        idx = bisect_right(self._starts, src) - 1
+
+        if idx >= 0 and src < self._ends[idx]:
+            return idx
 
-        return result
+        return None
 
     def get_dest(self, src: int) -> int:
         """ Return the destination for a given source value """
@@ -108,59 +286,165 @@ class AlmanacMap:
         if idx is None:
             return src
 
-        return self.dest[idx] + (src - self.source[idx])
+        return src + self._deltas[idx]
 
-    def get_dest_range(self, source_range: range) -> list[range]:
+    def _get_dest_many_numpy(self, srcs: Any) -> Any:
+        """ Batch lookup of a numpy array with searchsorted """
+        self._ensure_frozen()
+        if self._np_arrays is None:
+            self._np_arrays = (
+                np.array(self._starts, dtype=np.int64),
+                np.array(self._ends, dtype=np.int64),
+                np.array(self._deltas, dtype=np.int64),
+                )
+        starts, ends, deltas = self._np_arrays
+
+        if len(starts) == 0:
+            return srcs.copy()
+
+        # Index of the range that can contain each src, -1 if before all
+        idx = np.searchsorted(starts, srcs, side="right") - 1
+        clipped = np.maximum(idx, 0)
+        inside = (idx >= 0) & (srcs < ends[clipped])
+
+        return srcs + np.where(inside, deltas[clipped], 0)
+
+    def get_dest_many(self, srcs: Any) -> Any:
         """
-        Given a range of sources, compute the  corresponding output ranges.
+        Return the destinations for a batch of source values.
 
-        Note that for a given input range the output can be multiple ranges.
-        But the total length of the ranges should be the same as the input
-        range.
+        A numpy array is mapped with vectorised lookups and returns a numpy
+        array. Any other iterable of ints is mapped in pure Python and returns
+        an array('q').
+        """
+        if np is not None and isinstance(srcs, np.ndarray):
+            return self._get_dest_many_numpy(srcs)
+
+        self._ensure_frozen()
+        starts = self._starts
+        ends = self._ends
+        deltas = self._deltas
+
+        dests = array("q", srcs)
+        for i, src in enumerate(dests):
+            idx = bisect_right(starts, src) - 1
+            if idx >= 0 and src < ends[idx]:
+                dests[i] = src + deltas[idx]
+
+        return dests
+
+    def segments(
+            self,
+            start: int,
+            end: int,
+            ) -> Generator[tuple[int, int, int], None, None]:
         """
-        start = source_range.start
-        end = source_range.stop
+        Split the source values [start, end) into consecutive segments
+        (seg_start, seg_end, delta). Values outside the almanac ranges are
+        returned as segments with delta 0.
+        """
+        self._ensure_frozen()
+        starts = self._starts
+        ends = self._ends
 
-        # First range boundary is the start value of the input range
-        range_boundaries = [start]
+        # Only the range before the bisect point can contain start
+        idx = max(bisect_right(starts, start) - 1, 0)
 
-        # Loop over all ranges in the almanac to determine boundaries
-        for idx, x in enumerate(self.source):
-            if x >= end or x + self.length[idx] < start:
-                # If a range starts after the input range, or ends
-                # before it starts. Skip it.
+        while start < end and idx < len(starts) and starts[idx] < end:
+            if ends[idx] <= start:
+                # Almanac range ends before the input range
+                idx += 1
                 continue
 
-            if start < x < end:
-                # If start of range in the input range, add it to boundary list
-                range_boundaries.append(x)
-
-            if x + self.length[idx] < end:
-                # if end of range inside the input range, add it to the list
-                range_boundaries.append(x + self.length[idx])
+            if start < starts[idx]:
+                # Values before the almanac range map to themselves
+                yield start, starts[idx], 0
+                start = starts[idx]
 
-        # Add the end of the input range to the boundary list
-        range_boundaries.append(end)
+            stop = min(ends[idx], end)
+            yield start, stop, self._deltas[idx]
+            start = stop
+            idx += 1
 
-        # Generate the output ranges based on the previously computed
-        # range boundaries
-        output = []
-        for idx in range(0, len(range_boundaries) - 1, 2):
-            if range_boundaries[idx] == range_boundaries[idx+1]:
-                # This is purely to avoid some small scenarios where
-                # we get an empty range. e.g. range(5,5)
-                continue
+        if start < end:
+            # Values after the last almanac range map to themselves
+            yield start, end, 0
 
-            new_start = self.get_dest(range_boundaries[idx])
+    def dest_bands(self) -> Generator[tuple[int, int], None, None]:
+        """
+        Generate the bands [start, end) of destination values in ascending
+        order of start: the destinations of the almanac ranges, together
+        with the values outside the almanac ranges that map to themselves.
+        Bands can overlap, if the map is not one to one.
+        """
+        self._ensure_frozen()
+        starts = self._starts
+        ends = self._ends
+
+        images = (
+            (img_start, img_start + seg_end - seg_start)
+            for img_start, (seg_start, seg_end, _)
+            in zip(self._img_starts, self._img_segments)
+            )
+        gaps = (
+            (gap_start, gap_end)
+            for gap_start, gap_end
+            in zip([MIN_VALUE, *ends], [*starts, MAX_VALUE])
+            if gap_start < gap_end
+            )
+
+        yield from heapq.merge(images, gaps)
+
+    def inverse_segments(
+            self,
+            start: int,
+            end: int,
+            ) -> Generator[tuple[int, int, int], None, None]:
+        """
+        Return the segments (seg_start, seg_end, delta) of source values that
+        map into the destination values [start, end). The map doesn't need
+        to be one to one, so the segments are not sorted and can overlap.
+        """
+        # Values outside the almanac ranges (and ranges with delta 0)
+        # map to themselves
+        for seg_start, seg_end, delta in self.segments(start, end):
+            if delta == 0:
+                yield seg_start, seg_end, 0
+
+        # Ranges with a destination start before start - max_length end
+        # before start, so only a slice of the sorted destinations is checked
+        lo = bisect_right(self._img_starts, start - self._max_length)
+        hi = bisect_left(self._img_starts, end)
+        for seg_start, seg_end, delta in self._img_segments[lo:hi]:
+            seg_start = max(seg_start, start - delta)
+            seg_end = min(seg_end, end - delta)
+            if delta != 0 and seg_start < seg_end:
+                yield seg_start, seg_end, delta
+
+    def get_source_range(self, dest_range: range) -> list[range]:
+        """
+        Given a range of destinations, compute the source ranges that map
+        into it.
+        """
+        return _merge_ranges(
+            range(seg_start, seg_end)
+            for seg_start, seg_end, _
+            in self.inverse_segments(dest_range.start, dest_range.stop)
+            )
 
-            # To get the end value of the range end, we need to calculate the
-            # dest value 1 before the boundary (otherwise that value van lie
-            # in a diffetent range) and then add 1 again, to keep the correct
-            # length of the generator
-            new_stop = self.get_dest(range_boundaries[idx+1] - 1) + 1
-            output.append(range(new_start, new_stop))
+    def get_dest_range(self, source_range: range) -> list[range]:
+        """
+        Given a range of sources, compute the  corresponding output ranges.
 
-        return output
+        Note that for a given input range the output can be multiple ranges.
+        But the total length of the ranges should be the same as the input
+        range.
+        """
+        return [
+            range(seg_start + delta, seg_end + delta)
+            for seg_start, seg_end, delta
+            in self.segments(source_range.start, source_range.stop)
+            ]
 
 
 def construct_map(
@@ -178,6 +462,7 @@ def construct_map(
         }
 
 
+@register("day05", 1, reference=True)
 def find_min_location(
         idxs: list[int],
         maps: dict[str, AlmanacMap],
@@ -195,25 +480,298 @@ def find_min_location(
     return find_min_location(new_idxs, maps, map_order[1:])
 
 
+def _merge_ranges(ranges: Iterable[range]) -> list[range]:
+    """ Sort the ranges and merge the ones that overlap or touch """
+    merged: list[range] = []
+    for r in sorted(ranges, key=lambda r: r.start):
+        if not r:
+            continue
+        if merged and r.start <= merged[-1].stop:
+            if r.stop > merged[-1].stop:
+                merged[-1] = range(merged[-1].start, r.stop)
+        else:
+            merged.append(r)
+    return merged
+
+
+@register("day05", 2, reference=True)
 def find_min_location_range(
         idx: list[range],
         maps: dict[str, AlmanacMap],
         map_order: list[str],
+        stats: Optional[list[int]] = None,
         ) -> int:
     """
     Given a list of indexes, maps and a map_order. Returns the minimum value
     of the final map for the input indexes.
+
+    After every map the ranges are merged again, so the number of ranges is
+    bounded by the number of breakpoints of the maps. If a stats list is
+    given, the number of ranges after every stage is appended to it.
     """
-    if not map_order:
-        return min([x.start for x in idx])
+    ranges = _merge_ranges(idx)
+    if stats is not None:
+        stats.append(len(ranges))
 
-    this_map = maps[map_order[0]]
+    for name in map_order:
+        this_map = maps[name]
+
+        new_ranges = []
+        for r in ranges:
+            new_ranges += this_map.get_dest_range(r)
+
+        ranges = _merge_ranges(new_ranges)
+        if stats is not None:
+            stats.append(len(ranges))
 
-    new_ranges = []
-    for r in idx:
-        new_ranges += this_map.get_dest_range(r)
+    return ranges[0].start
+
+
+@register("day05", 1)
+def find_min_location_unit_ranges(
+        idxs: list[int],
+        maps: dict[str, AlmanacMap],
+        map_order: list[str],
+        ) -> int:
+    """
+    Same as `find_min_location`, but propagates every index as a range of
+    length 1 through the range based implementation.
+    """
+    return find_min_location_range(
+        [range(x, x + 1) for x in idxs], maps, map_order
+        )
+
+
+@register("day05", 2)
+def find_min_location_range_brute(
+        idx: list[range],
+        maps: dict[str, AlmanacMap],
+        map_order: list[str],
+        ) -> int:
+    """
+    Same as `find_min_location_range`, but maps every single value of the
+    ranges. Only usable for small ranges.
+    """
+    return find_min_location([x for r in idx for x in r], maps, map_order)
+
+
+# Bounds of the values the composed map is defined on
+MIN_VALUE = -(2**63)
+MAX_VALUE = 2**63
+
+
+def compose_maps(maps: dict[str, AlmanacMap], map_order: list[str]) -> AlmanacMap:
+    """
+    Compose the chain of maps into a single piecewise linear AlmanacMap.
+
+    Starting from the identity, the image of every segment is split on the
+    breakpoints of the next map in the chain. Adjacent segments with the same
+    delta are merged again after every map.
+    """
+    segments = [(MIN_VALUE, MAX_VALUE, 0)]
 
-    return find_min_location_range(new_ranges, maps, map_order[1:])
+    for name in map_order:
+        next_map = maps[name]
+        new_segments: list[tuple[int, int, int]] = []
+
+        for start, end, delta in segments:
+            for img_start, img_end, next_delta in next_map.segments(
+                    start + delta, end + delta
+                    ):
+                seg_start = img_start - delta
+                seg_end = img_end - delta
+                new_delta = delta + next_delta
+
+                if new_segments and new_segments[-1][1:] == (seg_start, new_delta):
+                    # Merge with the previous segment
+                    new_segments[-1] = (new_segments[-1][0], seg_end, new_delta)
+                else:
+                    new_segments.append((seg_start, seg_end, new_delta))
+
+        segments = new_segments
+
+    composed = AlmanacMap(name=f"{map_order[0]}..{map_order[-1]}")
+    for start, end, delta in segments:
+        if delta:
+            composed.add(source=start, dest=start + delta, length=end - start)
+    composed.freeze()
+
+    return composed
+
+
+def get_dest_many_chain(
+        srcs: Any,
+        maps: dict[str, AlmanacMap],
+        map_order: list[str],
+        ) -> Any:
+    """ Map a batch of source values through the chain of maps """
+    for name in map_order:
+        srcs = maps[name].get_dest_many(srcs)
+    return srcs
+
+
+def _min_location_composed(composed: AlmanacMap, seed_ranges: list[range]) -> int:
+    """
+    Returns the minimum location for the seed ranges. Within a composed
+    segment the location increases with the seed, so the minimum is at the
+    start of one of the segments.
+    """
+    return min(
+        seg_start + delta
+        for r in seed_ranges
+        for seg_start, _, delta in composed.segments(r.start, r.stop)
+        )
+
+
+@register("day05", 1)
+def find_min_location_composed(
+        idxs: list[int],
+        maps: dict[str, AlmanacMap],
+        map_order: list[str],
+        ) -> int:
+    """ Same as `find_min_location`, using the composed map """
+    composed = compose_maps(maps, map_order)
+    return min(composed.get_dest(x) for x in idxs)
+
+
+@register("day05", 1)
+def find_min_location_batch(
+        idxs: list[int],
+        maps: dict[str, AlmanacMap],
+        map_order: list[str],
+        ) -> int:
+    """ Same as `find_min_location`, with a batch lookup in the composed map """
+    composed = compose_maps(maps, map_order)
+    return min(composed.get_dest_many(idxs))
+
+
+@register("day05", 2)
+def find_min_location_range_composed(
+        idx: list[range],
+        maps: dict[str, AlmanacMap],
+        map_order: list[str],
+        ) -> int:
+    """ Same as `find_min_location_range`, using the composed map """
+    return _min_location_composed(compose_maps(maps, map_order), idx)
+
+
+def get_source_range_chain(
+        dest_range: range,
+        maps: dict[str, AlmanacMap],
+        map_order: list[str],
+        ) -> list[range]:
+    """
+    Return the ranges of the first map in the chain, that map into the
+    dest_range of the last map.
+    """
+    ranges = [dest_range]
+    for name in reversed(map_order):
+        this_map = maps[name]
+        ranges = _merge_ranges(
+            source for r in ranges for source in this_map.get_source_range(r)
+            )
+    return ranges
+
+
+def _first_in_ranges(
+        ranges: list[range],
+        starts: list[int],
+        start: int,
+        end: int,
+        ) -> Optional[int]:
+    """
+    Return the first value of the sorted, merged ranges in [start, end).
+    starts are the starts of the ranges.
+    """
+    idx = max(bisect_right(starts, start) - 1, 0)
+    for r in ranges[idx:]:
+        if r.start >= end:
+            break
+        if r.stop > start:
+            return max(r.start, start)
+    return None
+
+
+@register("day05", 2)
+def find_min_location_reverse(
+        idx: list[range],
+        maps: dict[str, AlmanacMap],
+        map_order: list[str],
+        ) -> int:
+    """
+    Same as `find_min_location_range`, searching from the locations back to
+    the seeds.
+
+    The location bands of the composed map are walked in ascending order,
+    independent of the seeds. For each band the seeds that map into it are
+    looked up. The search stops as soon as the next band starts after the
+    best location found, so the bands after it are never looked at.
+    """
+    seed_ranges = _merge_ranges(idx)
+    seed_starts = [r.start for r in seed_ranges]
+    composed = compose_maps(maps, map_order)
+
+    best: Optional[int] = None
+    for band_start, band_end in composed.dest_bands():
+        if best is not None and band_start >= best:
+            break
+
+        for seg_start, seg_end, delta in composed.inverse_segments(
+                band_start, band_end
+                ):
+            seed = _first_in_ranges(seed_ranges, seed_starts, seg_start, seg_end)
+            if seed is not None and (best is None or seed + delta < best):
+                best = seed + delta
+
+    if best is None:
+        raise ValueError("No seeds to find a location for")
+
+    return best
+
+
+@dataclass
+class Almanac:
+    """
+    The seeds and maps of an almanac. The composition of the chain of maps
+    is computed once and reused for all queries.
+    """
+    seeds: list[int]
+    maps: dict[str, AlmanacMap]
+    map_order: list[str] = field(default_factory=lambda: list(MAPNAMES))
+
+    @functools.cached_property
+    def composed(self) -> AlmanacMap:
+        """ The chain of maps composed into a single map """
+        return compose_maps(self.maps, self.map_order)
+
+    def get_location(self, seed: int) -> int:
+        """ Return the location of a seed """
+        return self.composed.get_dest(seed)
+
+    def get_locations(self, seeds: Iterable[int]) -> Any:
+        """
+        Return the locations of a batch of seeds, see
+        `AlmanacMap.get_dest_many`
+        """
+        return self.composed.get_dest_many(seeds)
+
+    def get_seeds(self, location_range: range) -> list[range]:
+        """ Return the seed ranges that map into the location range """
+        return self.composed.get_source_range(location_range)
+
+    def min_location(self, seeds: list[int]) -> int:
+        """ Return the minimum location of the seeds """
+        return min(self.composed.get_dest(x) for x in seeds)
+
+    def min_location_range(self, seed_ranges: list[range]) -> int:
+        """ Return the minimum location of the seed ranges """
+        return _min_location_composed(self.composed, seed_ranges)
+
+
+def parse_almanac(data: str) -> Almanac:
+    """ Parse the input data into an Almanac """
+    seeds, maps = _parse_almanac(data)
+    return Almanac(seeds, maps)
 
 
 def _parse_almanac(data: str) -> tuple[list[int], dict[str, AlmanacMap]]:
@@ -241,39 +799,82 @@ def _parse_almanac(data: str) -> tuple[list[int], dict[str, AlmanacMap]]:
 
             maps[map_name].add(dest=nums[0], source=nums[1], length=nums[2])
 
+    for almanac_map in maps.values():
+        almanac_map.freeze()
+
     return seeds, maps
 
 
+def _seed_ranges(seeds: list[int]) -> list[range]:
+    """ Interpret the seeds as pairs of (start, length) """
+    return [
+        range(seeds[x], seeds[x] + seeds[x+1])
+        for x in range(0, len(seeds), 2)
+        ]
+
+
 def compute(data: str) -> int:
     """ Compute function for part 1 """
-    mapnames = [
-        "seed-to-soil", "soil-to-fertilizer", "fertilizer-to-water",
-        "water-to-light", "light-to-temperature", "temperature-to-humidity",
-        "humidity-to-location"
-    ]
+    almanac = parse_almanac(data)
 
-    seeds, maps = _parse_almanac(data)
-
-    res = find_min_location(seeds, maps, mapnames)
-    return res
+    return almanac.min_location(almanac.seeds)
 
 
 def compute2(data: str):
     """ Compute function for part 2 """
-    mapnames = [
-        "seed-to-soil", "soil-to-fertilizer", "fertilizer-to-water",
-        "water-to-light", "light-to-temperature", "temperature-to-humidity",
-        "humidity-to-location"
-    ]
+    almanac = parse_almanac(data)
 
-    seeds, maps = _parse_almanac(data)
-    seed_ranges = [
-        range(seeds[x], seeds[x] + seeds[x+1])
-        for x in range(0, len(seeds), 2)
+    return almanac.min_location_range(_seed_ranges(almanac.seeds))
+
+
+def _random_almanac(rng: random.Random, size: int) -> dict[str, AlmanacMap]:
+    """
+    Generate random almanac maps with non-overlapping source ranges
+    in [0, size).
+    """
+    maps: dict[str, AlmanacMap] = {}
+    for name in MAPNAMES:
+        maps[name] = AlmanacMap(name=name)
+
+        # Random non overlapping source ranges, mapped to random destinations
+        bounds = sorted(rng.sample(range(size), 2 * rng.randint(0, 4)))
+        for start, stop in zip(bounds[::2], bounds[1::2]):
+            dest = rng.randrange(size)
+            maps[name].add(source=start, dest=dest, length=stop - start)
+
+        maps[name].freeze()
+
+    return maps
+
+
+def engine_cases(
+        part: int,
+        rng: random.Random,
+        ) -> list[tuple[list, dict[str, AlmanacMap], list[str]]]:
+    """
+    Cases for the engine harness: the example input, plus randomised small
+    almanacs with random seeds (part 1) or seed ranges (part 2).
+    """
+    seeds, maps = _parse_almanac(INPUT1)
+    if part == 2:
+        seeds = _seed_ranges(seeds)
+    cases: list[tuple[list, dict[str, AlmanacMap], list[str]]] = [
+        (seeds, maps, MAPNAMES)
         ]
 
-    res = find_min_location_range(seed_ranges, maps, mapnames)
-    return res
+    for _ in range(200):
+        maps = _random_almanac(rng, 100)
+        # pairs of (start, length) for part 2
+        seeds = [
+            x
+            for _ in range(rng.randint(1, 5))
+            for x in (rng.randrange(120), rng.randint(1, 20))
+            ]
+        if part == 2:
+            seeds = _seed_ranges(seeds)
+        cases.append((seeds, maps, MAPNAMES))
+
+    return cases
 
 
 def main() -> None:
@@ -1,11 +1,21 @@
 """ Advent of Code 2023 day 6 """
 
 import math
+import random
+from array import array
 from dataclasses import dataclass
+from typing import Any
+
+import pytest
 
 from utils import get_integers_from_line
 from utils import get_numbers_from_line
 
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, the batch solver falls back to array
+    np = None
+
 INPUT1 = """\
 Time:      7  15   30
 Distance:  9  40  200
@@ -25,6 +35,136 @@ def test_case2():
     assert compute2(INPUT1) == EXPECTED2
 
 
+def test_exact_for_large_values():
+    """ Test the boundaries of the winning range for very large races """
+    rng = random.Random(6)
+    for _ in range(100):
+        time = rng.randrange(10**30)
+        record = rng.randrange(time**2 // 4)
+        race = Race(time, record)
+        win_range = race.get_range_to_beat_record()
+
+        assert race.calculate_distance(win_range.start) > record
+        assert race.calculate_distance(win_range.start - 1) <= record
+        assert race.calculate_distance(win_range.stop - 1) > record
+        assert race.calculate_distance(win_range.stop) <= record
+
+
+def test_count_ways_many():
+    """ Test the batch solver against brute force """
+    times = list(range(1, 60))
+    records = [t * t // 4 - t // 3 for t in times]
+    expected = [
+        sum(h * (t - h) > r for h in range(t + 1)) for t, r in zip(times, records)
+        ]
+
+    assert list(count_ways_many(times, records)) == expected
+
+
+def test_count_ways_many_numpy():
+    """ Test the numpy batch solver against the exact solver """
+    numpy = pytest.importorskip("numpy")
+    rng = random.Random(6)
+    times = [rng.randrange(1, 10**8) for _ in range(1000)]
+    records = [rng.randrange(t * t // 4 + 10) for t in times]
+    expected = list(count_ways_many(times, records))
+
+    result = count_ways_many(
+        numpy.array(times, dtype=numpy.int64),
+        numpy.array(records, dtype=numpy.int64),
+        )
+    assert result.tolist() == expected
+
+    # Times around and above the int64 limit of the vectorised pass
+    times = [NUMPY_MAX_TIME, NUMPY_MAX_TIME + 1] + [
+        rng.randrange(2**32, 2**40) for _ in range(100)
+        ]
+    records = [rng.randrange(t * t // 4 + 10) for t in times]
+    records = [min(r, 2**63 - 1) for r in records]
+    expected = list(count_ways_many(times, records))
+
+    result = count_ways_many(
+        numpy.array(times, dtype=numpy.int64),
+        numpy.array(records, dtype=numpy.int64),
+        )
+    assert result.tolist() == expected
+
+
+def first_winning_hold(time: int, record: int) -> int:
+    """
+    Returns the shortest time to hold the button that beats the record,
+    or time // 2 + 1 if the record can't be beaten.
+
+    The square root is computed exactly with math.isqrt, after which the
+    boundary is corrected with integer arithmetic. So the result is exact
+    for arbitrarily large values.
+    """
+    best = time // 2
+    if best * (time - best) <= record:
+        return best + 1
+
+    # Intersection with y = record + 1, rounded towards the maximum
+    x = max((time - math.isqrt(time**2 - 4 * (record + 1))) // 2, 0)
+    while x > 0 and (x - 1) * (time - x + 1) > record:
+        x -= 1
+    while x * (time - x) <= record:
+        x += 1
+
+    return x
+
+
+# Largest time for which time**2 fits in an int64
+NUMPY_MAX_TIME = math.isqrt(2**63 - 1)
+
+
+def _count_ways_many_numpy(times: Any, records: Any) -> Any:
+    """
+    Vectorised version of count_ways_many for numpy int64 arrays. Falls back
+    to the exact solver if time**2 doesn't fit in an int64.
+    """
+    times = times.astype(np.int64)
+    records = records.astype(np.int64)
+
+    if times.size and times.max() > NUMPY_MAX_TIME:
+        counts = count_ways_many(times.tolist(), records.tolist())
+        return np.array(counts, dtype=np.int64)
+
+    # A record of at least time**2 // 4 can't be beaten, clipping it keeps
+    # 4 * (records + 1) in an int64
+    records = np.minimum(records, times * times // 4)
+
+    disc = np.maximum(times * times - 4 * (records + 1), 0)
+    x = np.maximum((times - np.floor(np.sqrt(disc)).astype(np.int64)) // 2, 0)
+
+    # Correct the rounding of the float square root
+    for _ in range(2):
+        x -= (x > 0) & ((x - 1) * (times - x + 1) > records)
+        x += x * (times - x) <= records
+
+    best = times // 2
+    wins = best * (times - best) > records
+    return np.where(wins, times - 2 * x + 1, 0)
+
+
+def count_ways_many(times: Any, records: Any) -> Any:
+    """
+    Returns the number of ways to beat the record for every (time, record)
+    pair of the columns.
+
+    numpy arrays are solved in one vectorised pass and return a numpy array
+    (times above NUMPY_MAX_TIME are solved exactly per pair instead), other
+    sequences return an array('q').
+    """
+    if np is not None and isinstance(times, np.ndarray):
+        return _count_ways_many_numpy(times, np.asarray(records))
+
+    counts = array("q", bytes(8 * len(times)))
+    for idx, (time, record) in enumerate(zip(times, records)):
+        counts[idx] = max(time - 2 * first_winning_hold(time, record) + 1, 0)
+
+    return counts
+
+
 @dataclass
 class Race:
     """
@@ -42,7 +182,7 @@ class Race:
         Returns the distance traveled for a givent acceleration
         period t
         """
-        return -t * (t + self.time)
+        return t * (self.time - t)
 
     def get_range_to_beat_record(self) -> range:
         """
@@ -56,13 +196,13 @@ class Race:
         Intersection points can be calculated using the following formula:
 
         x = (t ± √(t**2 - 4 * d)) / 2
+
+        The range is symmetric around t / 2. If the record can't be beaten
+        an empty range is returned.
         """
-        t = self.time
-        d = self.record_distance + 1
-        x_start = math.ceil((t - math.sqrt(t**2 - 4 * d)) / 2)
-        x_end = math.floor((t + math.sqrt(t**2 - 4 * d)) / 2)
+        x_start = first_winning_hold(self.time, self.record_distance)
 
-        return range(x_start, x_end + 1)
+        return range(x_start, max(self.time - x_start + 1, x_start))
 
 
 def compute(data: str) -> int:
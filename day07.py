@@ -1,7 +1,23 @@
 """ Advent of Code 2023 day 7 """
 
+import functools
+import heapq
+import random
+import struct
+import tempfile
+from array import array
+from bisect import bisect_left
+from bisect import bisect_right
+from contextlib import ExitStack
 from dataclasses import dataclass
 from enum import IntEnum
+from itertools import islice
+from operator import attrgetter
+from operator import itemgetter
+from typing import BinaryIO
+from typing import Generator
+from typing import Iterable
+from typing import Optional
 
 import pytest
 
@@ -61,69 +77,113 @@ class HandStrength(IntEnum):
     HIGH = 1
 
 
+# Hand strength by the counts of the cards, sorted from high to low
+STRENGTH_BY_SIGNATURE = {
+    (5,): HandStrength.FIVE,
+    (4, 1): HandStrength.FOUR,
+    (3, 2): HandStrength.FULLHOUSE,
+    (3, 1, 1): HandStrength.THREE,
+    (2, 2, 1): HandStrength.TWOPAIR,
+    (2, 1, 1, 1): HandStrength.PAIR,
+    (1, 1, 1, 1, 1): HandStrength.HIGH,
+}
+
+# Bits per card value in a packed sort key
+CARD_BITS = 4
+
+
+def pack_key(strength: int, card_values: list[int]) -> int:
+    """
+    Pack the hand strength and the card values into a single int, that sorts
+    the same as the hands. The strength is in the high bits, followed by
+    4 bits per card.
+    """
+    key = strength
+    for value in card_values:
+        key = (key << CARD_BITS) | value
+    return key
+
+
+def strength_of_cards(cards: str, wildcard: Optional[str] = None) -> HandStrength:
+    """
+    Determine the strength of the cards, optionally with a wildcard.
+
+    The wildcard is added to the other card that has the highest occurence.
+    As this will increase the card strength the most.
+    """
+    # Count non-wildcard characters
+    card_counts = sorted(
+        (cards.count(c) for c in set(cards) if c != wildcard), reverse=True
+        )
+
+    if wildcard is not None:
+        n_wildcards = cards.count(wildcard)
+        if card_counts:
+            card_counts[0] += n_wildcards
+        else:
+            # If list is empty, all characters all wildcards
+            card_counts.append(n_wildcards)
+
+    try:
+        return STRENGTH_BY_SIGNATURE[tuple(card_counts)]
+    except KeyError:
+        raise ValueError(f"Incorrect hand received: {cards}") from None
+
+
+def cards_key(cards: str, wildcard: bool = False) -> int:
+    """
+    Returns the packed key of the cards without creating a Hand. With
+    wildcard, J is the wildcard (see `HandWildCard`).
+    """
+    if wildcard:
+        strength = strength_of_cards(cards, "J")
+        values = CARD_VALUES_WILDCARD
+    else:
+        strength = strength_of_cards(cards)
+        values = CARD_VALUES
+
+    return pack_key(strength, [values[c] for c in cards])
+
+
 @dataclass
 class Hand:
     """ representation of a Camel Cards hand """
     cards: str
     bid: int = 0
 
-    def _strength_from_count(self, card_counts: list[int]) -> HandStrength:
-        """
-        Return the hand strength based on a list of counts of occurences
-        """
-        sorted_count = sorted(card_counts, reverse=True)
-        match len(sorted_count):
-            case 1:
-                strength = HandStrength.FIVE
-            case 2 if sorted_count[0] == 4:
-                strength = HandStrength.FOUR
-            case 2:
-                strength = HandStrength.FULLHOUSE
-            case 3 if sorted_count[0] == 3:
-                strength = HandStrength.THREE
-            case 3:
-                strength = HandStrength.TWOPAIR
-            case 4:
-                strength = HandStrength.PAIR
-            case 5:
-                strength = HandStrength.HIGH
-            case _:
-                raise ValueError(f"Incorrect hand received: {self.cards}")
-        return strength
-
     @property
     def hand_strength(self) -> HandStrength:
         """ Determine the strength of the hand """
-        unique_chars = set(self.cards)
-        counted_chars = [self.cards.count(c) for c in unique_chars]
-
-        return self._strength_from_count(counted_chars)
+        return strength_of_cards(self.cards)
 
     @property
     def card_values(self) -> list[int]:
         """ Returns a list of the values of the cards in the hand. """
         return [CARD_VALUES[x] for x in self.cards]
 
+    @functools.cached_property
+    def sort_key(self) -> int:
+        """
+        Packed int key of the hand, computed once. The same key as
+        `cards_key`, which shares the strength rules of `strength_of_cards`
+        """
+        return pack_key(self.hand_strength, self.card_values)
+
     def __lt__(self, other) -> bool:
         """ Less Than function for sorting """
-        if self.cards == other.cards:
-            return False
-        elif self.hand_strength == other.hand_strength:
-            return self.card_values < other.card_values
-        else:
-            return self.hand_strength < other.hand_strength
+        return self.sort_key < other.sort_key
 
     def __le__(self, other) -> bool:
         """ Less Than or Equal function for sorting """
-        return self.cards == other.cards or self < other
+        return self.sort_key <= other.sort_key
 
     def __gt__(self, other) -> bool:
         """ Greater Than function for sorting """
-        return not self <= other
+        return self.sort_key > other.sort_key
 
     def __ge__(self, other) -> bool:
         """ Greater Than or Equal function for sorting """
-        return not self < other
+        return self.sort_key >= other.sort_key
 
 
 @dataclass
@@ -145,27 +205,7 @@ class HandWildCard(Hand):
     @property
     def hand_strength(self) -> HandStrength:
         """ Determine the strength of the hand """
-        unique_chars = set(self.cards)
-
-        # Count non-wildcard characters
-        counted_chars = sorted(
-            [
-                self.cards.count(c)
-                for c in unique_chars
-                if c != self.wildcard
-            ],
-            reverse=True)
-
-        if not counted_chars:
-            # If list is empty, all characters all wildcards
-            counted_chars.append(self.n_wildcards)
-        else:
-            # Add the number of wildcards to the other card that has
-            # the highest occurence. As this will increase the card
-            # strength the most
-            counted_chars[0] += self.n_wildcards
-
-        return self._strength_from_count(counted_chars)
+        return strength_of_cards(self.cards, self.wildcard)
 
 
 def test_case1():
@@ -194,6 +234,100 @@ def test_hand_strength(card: Hand, strength: HandStrength):
     assert card.hand_strength == strength
 
 
+def test_sort_key():
+    """ Test that the sort keys order the hands by strength, then cards """
+    for line in _random_hands(random.Random(46), 200):
+        cards = line.split()[0]
+        assert Hand(cards).sort_key == cards_key(cards)
+        assert HandWildCard(cards).sort_key == cards_key(cards, wildcard=True)
+
+    assert Hand("33332").sort_key > Hand("2AAAA").sort_key
+    assert Hand("77888").sort_key > Hand("77788").sort_key
+    assert Hand("KK677").sort_key > Hand("KTJJT").sort_key
+    assert HandWildCard("KTJJT").sort_key > HandWildCard("QQQJA").sort_key
+    assert HandWildCard("JKKK2").sort_key < HandWildCard("QQQQ2").sort_key
+
+
+def _random_hands(rng: random.Random, n: int) -> list[str]:
+    """ Generate n random hand lines, from few cards so there are duplicates """
+    cards = "AKJT2"
+    return [
+        f"{''.join(rng.choices(cards, k=5))} {rng.randint(1, 1000)}"
+        for _ in range(n)
+        ]
+
+
+def test_radix():
+    """ Test that the radix sort gives the same winnings as sorted """
+    lines = _random_hands(random.Random(7), 2000)
+    data = "\n".join(lines)
+
+    assert compute_radix(INPUT1.splitlines()) == EXPECTED1
+    assert compute_radix(INPUT1.splitlines(), wildcard=True) == EXPECTED2
+    assert compute_radix(lines) == compute(data)
+    assert compute_radix(lines, wildcard=True) == compute2(data)
+
+
+def test_external(tmp_path):
+    """ Test that the external merge sort gives the same winnings as sorted """
+    lines = _random_hands(random.Random(8), 2000)
+    data = "\n".join(lines)
+
+    assert compute_external(INPUT1.splitlines(), chunk_size=2) == EXPECTED1
+    result = compute_external(lines, chunk_size=300, tmp_dir=str(tmp_path))
+    assert result == compute(data)
+    assert compute_external(lines, wildcard=True, chunk_size=300) == compute2(data)
+    assert compute_external([]) == 0
+
+
+def test_rank_index():
+    """ Test the rank and winnings queries against sorting the corpus """
+    rng = random.Random(9)
+    lines = _random_hands(rng, 500)
+    index = HandRankIndex.from_lines(lines[:300], block_size=8)
+
+    for line in lines[300:]:
+        cards, bid = line.split()
+        index.insert(cards, int(bid))
+    for line in lines[:100]:
+        cards, bid = line.split()
+        index.remove(cards, int(bid))
+
+    remaining = lines[100:300] + lines[300:]
+    assert index.winnings() == compute("\n".join(remaining))
+    assert len(index) == len(remaining)
+
+    ranked = sorted(
+        ((cards_key(line.split()[0]), int(line.split()[1])) for line in remaining),
+        key=itemgetter(0),
+        )
+    for _ in range(50):
+        lo = rng.randint(1, len(ranked))
+        hi = rng.randint(lo - 1, len(ranked))
+        expected = sum(rank * ranked[rank - 1][1] for rank in range(lo, hi + 1))
+        assert index.winnings(lo, hi) == expected
+
+    for line in lines:
+        cards = line.split()[0]
+        weaker = sum(key < cards_key(cards) for key, _ in ranked)
+        assert index.rank(cards) == weaker + 1
+
+    with pytest.raises(ValueError):
+        index.remove("AAAAA", 0)
+
+
+def test_rank_index_example():
+    """ Test the rank index for the example """
+    index = HandRankIndex(wildcard=True)
+    for line in INPUT1.splitlines():
+        cards, bid = line.split()
+        index.insert(cards, int(bid))
+
+    assert index.winnings() == EXPECTED2
+    assert index.rank("KTJJT") == 5
+    assert index.winnings(5, 5) == 5 * 220
+
+
 def parse_hand(line: str) -> Hand:
     """ Parse the Hand defined by the line """
     split_line = line.split(" ")
@@ -210,10 +344,9 @@ def parse_wildcard_hand(line: str) -> HandWildCard:
     return HandWildCard(cards, bid[0])
 
 
-def compute(data: str) -> int:
-    """ Compute the result for part 1 """
-    hands = [parse_hand(line) for line in data.splitlines()]
-    sorted_hands = sorted(hands)
+def total_winnings(hands: list[Hand]) -> int:
+    """ Returns the sum of the bids of the hands multiplied by their rank """
+    sorted_hands = sorted(hands, key=attrgetter("sort_key"))
     total_score = 0
     for rank, hand in enumerate(sorted_hands):
         total_score += (rank + 1) * hand.bid
@@ -221,18 +354,353 @@ def compute(data: str) -> int:
     return total_score
 
 
-def compute2(data: str) -> int:
-    """ Compute the result for part 2 """
-    hands = [parse_wildcard_hand(line) for line in data.splitlines()]
-    sorted_hands = sorted(hands)
-    # breakpoint()
+def parse_keys(
+        lines: Iterable[str],
+        wildcard: bool = False,
+        ) -> tuple[array, array]:
+    """ Parse the lines into parallel arrays of packed keys and bids """
+    keys = array("I")
+    bids = array("I")
+    for line in lines:
+        cards, bid = line.split()
+        keys.append(cards_key(cards, wildcard))
+        bids.append(int(bid))
+
+    return keys, bids
+
+
+# The packed keys have 23 bits, they are sorted in 2 passes of 12 bits
+RADIX_BITS = 12
+RADIX_PASSES = 2
+
+
+def radix_winnings(keys: array, bids: array) -> int:
+    """
+    Returns the total winnings of the hands, by sorting the keys with a
+    stable LSD radix sort. Every pass is a counting sort of the bids on
+    RADIX_BITS of the keys, the winnings are summed while placing the bids
+    in the last pass.
+    """
+    n_buckets = 1 << RADIX_BITS
+    mask = n_buckets - 1
+    n = len(keys)
     total_score = 0
-    for rank, hand in enumerate(sorted_hands):
-        total_score += (rank + 1) * hand.bid
+
+    for radix in range(RADIX_PASSES):
+        shift = radix * RADIX_BITS
+        last_pass = radix == RADIX_PASSES - 1
+
+        # Start position of every bucket
+        positions = array("I", bytes(4 * n_buckets))
+        for key in keys:
+            positions[(key >> shift) & mask] += 1
+        start = 0
+        for bucket in range(n_buckets):
+            start, positions[bucket] = start + positions[bucket], start
+
+        sorted_keys = array("I", bytes(4 * n))
+        sorted_bids = array("I", bytes(4 * n))
+        for key, bid in zip(keys, bids):
+            bucket = (key >> shift) & mask
+            pos = positions[bucket]
+            positions[bucket] = pos + 1
+            sorted_keys[pos] = key
+            sorted_bids[pos] = bid
+            if last_pass:
+                total_score += (pos + 1) * bid
+
+        keys, bids = sorted_keys, sorted_bids
+
+    return total_score
+
+
+def compute_radix(lines: Iterable[str], wildcard: bool = False) -> int:
+    """
+    Compute the total winnings with a radix sort over packed keys, without
+    creating Hand objects. Meant for very large hand files.
+    """
+    keys, bids = parse_keys(lines, wildcard)
+    return radix_winnings(keys, bids)
+
+
+# (key, bid) records of the sorted runs of the external sort
+RUN_RECORD = struct.Struct("<II")
+
+
+def _write_run(
+        records: list[tuple[int, int]],
+        tmp_dir: Optional[str] = None,
+        ) -> BinaryIO:
+    """ Sort the records on key and spill them to a temporary file """
+    records.sort(key=itemgetter(0))
+
+    f = tempfile.TemporaryFile(dir=tmp_dir)
+    for record in records:
+        f.write(RUN_RECORD.pack(*record))
+    f.seek(0)
+
+    return f
+
+
+def _read_run(
+        f: BinaryIO,
+        block_size: int = 4096,
+        ) -> Generator[tuple[int, int], None, None]:
+    """ Read the records of a sorted run, block_size records at a time """
+    while block := f.read(RUN_RECORD.size * block_size):
+        yield from RUN_RECORD.iter_unpack(block)
+
+
+def compute_external(
+        lines: Iterable[str],
+        wildcard: bool = False,
+        chunk_size: int = 1_000_000,
+        tmp_dir: Optional[str] = None,
+        ) -> int:
+    """
+    Compute the total winnings with an external merge sort, for hand files
+    that don't fit in memory.
+
+    The lines are read in chunks of chunk_size hands, every chunk is sorted
+    and spilled to a temporary file. The sorted runs are merged while the
+    winnings are summed, so at most 1 chunk is kept in memory.
+    """
+    lines = iter(lines)
+    total_score = 0
+
+    with ExitStack() as stack:
+        runs = []
+        while chunk := list(islice(lines, chunk_size)):
+            records = []
+            for line in chunk:
+                cards, bid = line.split()
+                records.append((cards_key(cards, wildcard), int(bid)))
+            runs.append(stack.enter_context(_write_run(records, tmp_dir)))
+
+        # heapq.merge is stable, equal keys keep the order of the input
+        merged = heapq.merge(*(_read_run(f) for f in runs), key=itemgetter(0))
+        for rank, (_, bid) in enumerate(merged, start=1):
+            total_score += rank * bid
 
     return total_score
 
 
+class HandRankIndex:
+    """
+    Index of a corpus of hands, sorted by packed key, for repeated rank and
+    winnings queries.
+
+    The keys are kept in a blocked sorted list: a list of sorted blocks of at
+    most 2 * block_size keys. Every block has prefix sums of its bids and of
+    its bids weighted by the position in the block, next to cumulative
+    counts and winnings over the blocks. Inserting or removing a hand only
+    rebuilds the prefix sums of 1 block, the cumulative sums over the blocks
+    are rebuilt lazily on the next query.
+
+    Hands with the same key are ranked in insertion order, the same as a
+    stable sort of the corpus.
+    """
+
+    def __init__(self, wildcard: bool = False, block_size: int = 512) -> None:
+        self.wildcard = wildcard
+        self.block_size = block_size
+
+        self._keys: list[list[int]] = []
+        self._bids: list[list[int]] = []
+        self._bid_prefix: list[list[int]] = []
+        self._weighted_prefix: list[list[int]] = []
+        self._maxes: list[int] = []
+
+        # Cumulative sums over the blocks, None when they need a rebuild
+        self._offsets: Optional[list[int]] = None
+        self._cum_winnings: list[int] = []
+
+    @classmethod
+    def from_lines(
+            cls,
+            lines: Iterable[str],
+            wildcard: bool = False,
+            block_size: int = 512,
+            ) -> "HandRankIndex":
+        """ Build the index from hand lines, with 1 sort of the corpus """
+        index = cls(wildcard, block_size)
+        keys, bids = parse_keys(lines, wildcard)
+        records = sorted(zip(keys, bids), key=itemgetter(0))
+
+        for start in range(0, len(records), block_size):
+            block = records[start:start + block_size]
+            index._keys.append([key for key, _ in block])
+            index._bids.append([bid for _, bid in block])
+            index._bid_prefix.append([])
+            index._weighted_prefix.append([])
+            index._maxes.append(block[-1][0])
+            index._rebuild_block(len(index._keys) - 1)
+
+        return index
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys in self._keys)
+
+    def _rebuild_block(self, block: int) -> None:
+        """ Rebuild the prefix sums of a block """
+        bid_prefix = [0]
+        weighted_prefix = [0]
+        for pos, bid in enumerate(self._bids[block]):
+            bid_prefix.append(bid_prefix[-1] + bid)
+            weighted_prefix.append(weighted_prefix[-1] + pos * bid)
+
+        self._bid_prefix[block] = bid_prefix
+        self._weighted_prefix[block] = weighted_prefix
+        self._maxes[block] = self._keys[block][-1]
+        self._offsets = None
+
+    def _ensure_offsets(self) -> list[int]:
+        """ Rebuild the cumulative counts and winnings over the blocks """
+        if self._offsets is None:
+            offsets = [0]
+            cum_winnings = [0]
+            for block, keys in enumerate(self._keys):
+                # The first hand in the block has rank offset + 1
+                winnings = (
+                    (offsets[-1] + 1) * self._bid_prefix[block][-1]
+                    + self._weighted_prefix[block][-1]
+                    )
+                offsets.append(offsets[-1] + len(keys))
+                cum_winnings.append(cum_winnings[-1] + winnings)
+
+            self._offsets = offsets
+            self._cum_winnings = cum_winnings
+
+        return self._offsets
+
+    def insert(self, cards: str, bid: int) -> None:
+        """ Add a hand to the index """
+        key = cards_key(cards, self.wildcard)
+
+        if not self._keys:
+            self._keys.append([key])
+            self._bids.append([bid])
+            self._bid_prefix.append([])
+            self._weighted_prefix.append([])
+            self._maxes.append(key)
+            self._rebuild_block(0)
+            return
+
+        # After the hands with the same key
+        block = min(bisect_right(self._maxes, key), len(self._keys) - 1)
+        pos = bisect_right(self._keys[block], key)
+        self._keys[block].insert(pos, key)
+        self._bids[block].insert(pos, bid)
+
+        if len(self._keys[block]) > 2 * self.block_size:
+            self._split_block(block)
+        else:
+            self._rebuild_block(block)
+
+    def _split_block(self, block: int) -> None:
+        """ Split a block that got too large in 2 halves """
+        half = len(self._keys[block]) // 2
+        self._keys.insert(block + 1, self._keys[block][half:])
+        self._bids.insert(block + 1, self._bids[block][half:])
+        self._bid_prefix.insert(block + 1, [])
+        self._weighted_prefix.insert(block + 1, [])
+        self._maxes.insert(block + 1, 0)
+        del self._keys[block][half:]
+        del self._bids[block][half:]
+
+        self._rebuild_block(block)
+        self._rebuild_block(block + 1)
+
+    def remove(self, cards: str, bid: int) -> None:
+        """
+        Remove a hand from the index, the first one with the same cards and
+        bid. Raises a ValueError if the hand is not in the index.
+        """
+        key = cards_key(cards, self.wildcard)
+
+        block = bisect_left(self._maxes, key)
+        while block < len(self._keys) and self._keys[block][0] <= key:
+            keys = self._keys[block]
+            pos = bisect_left(keys, key)
+            while pos < len(keys) and keys[pos] == key:
+                if self._bids[block][pos] == bid:
+                    del keys[pos]
+                    del self._bids[block][pos]
+                    self._remove_or_rebuild(block)
+                    return
+                pos += 1
+            block += 1
+
+        raise ValueError(f"Hand not in index: {cards} {bid}")
+
+    def _remove_or_rebuild(self, block: int) -> None:
+        """ Remove an empty block, otherwise rebuild its prefix sums """
+        if self._keys[block]:
+            self._rebuild_block(block)
+            return
+
+        del self._keys[block]
+        del self._bids[block]
+        del self._bid_prefix[block]
+        del self._weighted_prefix[block]
+        del self._maxes[block]
+        self._offsets = None
+
+    def rank(self, cards: str) -> int:
+        """
+        Returns the rank a hand with these cards would get: 1 + the number of
+        hands in the index that are weaker.
+        """
+        key = cards_key(cards, self.wildcard)
+        offsets = self._ensure_offsets()
+
+        block = bisect_left(self._maxes, key)
+        if block == len(self._keys):
+            return offsets[-1] + 1
+
+        return offsets[block] + bisect_left(self._keys[block], key) + 1
+
+    def _winnings_to(self, rank: int) -> int:
+        """ Returns the winnings of the hands with rank 1 up to rank """
+        offsets = self._ensure_offsets()
+        rank = min(max(rank, 0), offsets[-1])
+
+        block = bisect_right(offsets, rank) - 1
+        if block == len(self._keys):
+            return self._cum_winnings[-1]
+
+        pos = rank - offsets[block]
+        return (
+            self._cum_winnings[block]
+            + (offsets[block] + 1) * self._bid_prefix[block][pos]
+            + self._weighted_prefix[block][pos]
+            )
+
+    def winnings(self, lo_rank: int = 1, hi_rank: Optional[int] = None) -> int:
+        """
+        Returns the winnings of the hands with a rank from lo_rank up to and
+        including hi_rank (by default up to the last hand).
+        """
+        if hi_rank is None:
+            hi_rank = len(self)
+        if hi_rank < lo_rank:
+            return 0
+
+        return self._winnings_to(hi_rank) - self._winnings_to(lo_rank - 1)
+
+
+def compute(data: str) -> int:
+    """ Compute the result for part 1 """
+    hands = [parse_hand(line) for line in data.splitlines()]
+    return total_winnings(hands)
+
+
+def compute2(data: str) -> int:
+    """ Compute the result for part 2 """
+    hands: list[Hand] = [parse_wildcard_hand(line) for line in data.splitlines()]
+    return total_winnings(hands)
+
+
 def main() -> None:
     """ Runnning puzzle input """
     with open("day7_input.txt", "r") as f:
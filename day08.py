@@ -1,8 +1,21 @@
 """ Advent of Code 2023 day 8 """
 
 import math
+import random
 import re
+from array import array
 from dataclasses import dataclass
+from operator import attrgetter
+from typing import Callable
+from typing import Optional
+
+import pytest
+
+from deadline import Deadline
+from deadline import SolveTimeout
+from graph_utils import NodeInterner
+from harness import check_engines
+from harness import register
 
 INPUT1 = """\
 RL
@@ -40,6 +53,14 @@ XXX = (XXX, XXX)
 """
 EXPECTED3 = 6
 
+# No ghost end node can be reached from 11A
+INPUT4 = """\
+LR
+
+11A = (11B, 11B)
+11B = (11A, 11A)
+"""
+
 
 def test_case1():
     """ Test case for example 1 part 1 """
@@ -56,6 +77,51 @@ def test_case3():
     assert compute2(INPUT3) == EXPECTED3
 
 
+def test_unreachable_end_times_out():
+    """ Test that a walk that never reaches an end node stops at the deadline """
+    nodes, steps = read_input(INPUT4)
+    with pytest.raises(SolveTimeout) as exc_info:
+        count_steps_ghost(nodes, steps, Deadline(0.05))
+
+    assert exc_info.value.reason == "deadline passed"
+
+
+def test_unreachable_end_raises():
+    """ Test that the compiled network detects an unreachable end node """
+    with pytest.raises(ValueError):
+        compute2(INPUT4)
+
+
+def test_cancelled():
+    """ Test that a cancelled deadline stops the walk """
+    deadline = Deadline()
+    deadline.cancel()
+
+    with pytest.raises(SolveTimeout) as exc_info:
+        compute2(INPUT4, deadline)
+
+    assert exc_info.value.reason == "cancelled"
+
+
+def test_compiled_network():
+    """ Test the cycle jumps of the compiled network against walking it """
+    nodes, steps = read_input(INPUT3)
+    network = CompiledNetwork(nodes, steps, attrgetter("is_end_ghost"))
+
+    assert network.steps_to_end("11A") == 2
+    assert network.steps_to_end("22A") == 3
+    assert network.steps_to_end("11Z") == 0
+    with pytest.raises(ValueError):
+        network.steps_to_end("XXX")
+
+
+def test_engines():
+    """ Test that all engines agree with the reference implementation """
+    rng = random.Random(8)
+    for part in (1, 2):
+        check_engines("day08", part, engine_cases(part, rng))
+
+
 @dataclass
 class Node:
     """ Representation of a network node"""
@@ -108,6 +174,7 @@ def read_node_from_line(line: str) -> Node:
     return Node(match[0], match[1], match[2])
 
 
+@register("day08", 1, reference=True)
 def count_steps_to_end(nodes: dict[str, Node], steps: str) -> int:
     """ Count steps needed to go to end node """
     node = nodes["AAA"]
@@ -121,11 +188,23 @@ def count_steps_to_end(nodes: dict[str, Node], steps: str) -> int:
     return n_steps
 
 
-def _count_step_1node_ghost(node: Node, nodes: dict[str, Node], steps) -> int:
-    """ Count how many steps are required to reach a (ghost) end node """
+def _count_step_1node_ghost(
+        node: Node,
+        nodes: dict[str, Node],
+        steps,
+        deadline: Optional[Deadline] = None,
+        ) -> int:
+    """
+    Count how many steps are required to reach a (ghost) end node
+
+    Never ends if no end node can be reached, unless a deadline is given.
+    """
     n_steps = 0
 
     while not node.is_end_ghost:
+        if deadline is not None:
+            deadline.tick()
+
         next_node = node.get_next_nodes(steps[n_steps % len(steps)])
         node = nodes[next_node]
         n_steps += 1
@@ -133,7 +212,12 @@ def _count_step_1node_ghost(node: Node, nodes: dict[str, Node], steps) -> int:
     return n_steps
 
 
-def count_steps_ghost(nodes: dict[str, Node], steps):
+@register("day08", 2, reference=True)
+def count_steps_ghost(
+        nodes: dict[str, Node],
+        steps,
+        deadline: Optional[Deadline] = None,
+        ):
     """
     Returns the number of steps required to reach an end node
     simultaneously for all starting nodes.
@@ -144,12 +228,126 @@ def count_steps_ghost(nodes: dict[str, Node], steps):
     """
     start_nodes = [node for node in nodes.values() if node.is_start_ghost]
     n_steps_to_end = [
-        _count_step_1node_ghost(node, nodes, steps)
+        _count_step_1node_ghost(node, nodes, steps, deadline)
         for node in start_nodes
         ]
     return math.lcm(*n_steps_to_end)
 
 
+class CompiledNetwork:
+    """
+    The network compiled to integer arrays, for fast walks.
+
+    The nodes are interned to ints, with the next nodes in the arrays left
+    and right. For every node the node after a full cycle of the steps is
+    precomputed, with the first step in the cycle that lands on an end node.
+    Walks then advance a full cycle per lookup. Binary lifting over the
+    cycles (jumps of 1, 2, 4, ... cycles) finds the first cycle that reaches
+    an end node in O(log(nodes)) lookups.
+    """
+
+    def __init__(
+            self,
+            nodes: dict[str, Node],
+            steps: str,
+            is_end: Callable[[Node], bool],
+            deadline: Optional[Deadline] = None,
+            ) -> None:
+        if deadline is not None:
+            deadline.check()
+
+        self.interner = NodeInterner(nodes)
+        self.left = array("i", (self.interner.index(n.l) for n in nodes.values()))
+        self.right = array("i", (self.interner.index(n.r) for n in nodes.values()))
+        self.is_end = bytearray(is_end(n) for n in nodes.values())
+        self.n_steps = len(steps)
+
+        n_nodes = len(self.interner)
+        moves = []
+        for direction in steps:
+            match direction:
+                case "L":
+                    moves.append(self.left)
+                case "R":
+                    moves.append(self.right)
+                case _:
+                    raise ValueError(
+                        f"Incorrect direction '{direction}' provided."
+                        )
+
+        # Node after a full cycle, and the first step that reaches an end
+        # node in that cycle (-1 if none)
+        cycle_next = array("i", [0] * n_nodes)
+        self.first_end = array("i", [-1] * n_nodes)
+        for u in range(n_nodes):
+            if deadline is not None:
+                deadline.tick()
+
+            v = u
+            for step, move in enumerate(moves, start=1):
+                v = move[v]
+                if self.first_end[u] < 0 and self.is_end[v]:
+                    self.first_end[u] = step
+            cycle_next[u] = v
+
+        # jumps[level][u]: node after 2**level cycles from u,
+        # has_end[level][u]: whether an end node is reached in those cycles.
+        # Cycles repeat after n_nodes cycles, so if no end node is reached
+        # in 2**level >= n_nodes cycles it is never reached.
+        self.jumps = [cycle_next]
+        self.has_end = [bytearray(x >= 0 for x in self.first_end)]
+        for _ in range(n_nodes.bit_length()):
+            jump = self.jumps[-1]
+            has_end = self.has_end[-1]
+            self.jumps.append(array("i", (jump[jump[u]] for u in range(n_nodes))))
+            self.has_end.append(
+                bytearray(has_end[u] or has_end[jump[u]] for u in range(n_nodes))
+                )
+
+    def steps_to_end(self, name: str) -> int:
+        """
+        Returns the number of steps from the node to the first end node.
+        Raises a ValueError if no end node can be reached.
+        """
+        u = self.interner.index(name)
+        if self.is_end[u]:
+            return 0
+
+        if not self.has_end[-1][u]:
+            raise ValueError(f"No end node can be reached from {name}")
+
+        # Jump the largest number of cycles that doesn't reach an end node
+        n_cycles = 0
+        for level in reversed(range(len(self.jumps))):
+            if not self.has_end[level][u]:
+                u = self.jumps[level][u]
+                n_cycles += 1 << level
+
+        return n_cycles * self.n_steps + self.first_end[u]
+
+
+@register("day08", 1)
+def count_steps_to_end_compiled(nodes: dict[str, Node], steps: str) -> int:
+    """ Same as `count_steps_to_end`, using the compiled network """
+    network = CompiledNetwork(nodes, steps, attrgetter("is_end"))
+    return network.steps_to_end("AAA")
+
+
+@register("day08", 2)
+def count_steps_ghost_compiled(
+        nodes: dict[str, Node],
+        steps: str,
+        deadline: Optional[Deadline] = None,
+        ) -> int:
+    """ Same as `count_steps_ghost`, using the compiled network """
+    network = CompiledNetwork(nodes, steps, attrgetter("is_end_ghost"), deadline)
+    return math.lcm(*(
+        network.steps_to_end(node.name)
+        for node in nodes.values()
+        if node.is_start_ghost
+        ))
+
+
 def read_input(data: str) -> tuple[dict[str, Node], str]:
     """ Read steps and nodes from input data"""
     re_steps = r"^[LR]+$"
@@ -167,18 +365,70 @@ def read_input(data: str) -> tuple[dict[str, Node], str]:
     return nodes, steps
 
 
+def _reaches_end(
+        nodes: dict[str, Node],
+        steps: str,
+        start: str,
+        is_end: Callable[[Node], bool],
+        ) -> bool:
+    """
+    Check by walking if an end node is reached from start. After
+    nodes * steps steps the walk repeats.
+    """
+    node = nodes[start]
+    for n_steps in range(len(nodes) * len(steps) + 1):
+        if is_end(node):
+            return True
+        node = nodes[node.get_next_nodes(steps[n_steps % len(steps)])]
+    return False
+
+
+def _random_network(rng: random.Random, part: int) -> dict[str, Node]:
+    """ Generate a small random network with start and end nodes """
+    if part == 1:
+        names = ["AAA", "ZZZ"] + [f"N{i:02d}" for i in range(rng.randint(0, 10))]
+    else:
+        names = [f"{i:02d}{rng.choice('AZX')}" for i in range(rng.randint(2, 12))]
+
+    return {
+        name: Node(name, rng.choice(names), rng.choice(names)) for name in names
+        }
+
+
+def engine_cases(part: int, rng: random.Random) -> list[tuple[dict[str, Node], str]]:
+    """
+    Cases for the engine harness: the examples, plus randomised small
+    networks in which an end node can be reached from every start node.
+    """
+    examples = [INPUT1, INPUT2] if part == 1 else [INPUT3]
+    cases = [read_input(data) for data in examples]
+
+    is_end = attrgetter("is_end" if part == 1 else "is_end_ghost")
+    while len(cases) < 200:
+        nodes = _random_network(rng, part)
+        steps = "".join(rng.choice("LR") for _ in range(rng.randint(1, 8)))
+        starts = ["AAA"] if part == 1 else [
+            name for name in nodes if nodes[name].is_start_ghost
+            ]
+
+        if starts and all(_reaches_end(nodes, steps, s, is_end) for s in starts):
+            cases.append((nodes, steps))
+
+    return cases
+
+
 def compute(data: str) -> int:
     """ Compute the result for part 1 """
     nodes, steps = read_input(data)
 
-    return count_steps_to_end(nodes, steps)
+    return count_steps_to_end_compiled(nodes, steps)
 
 
-def compute2(data: str) -> int:
+def compute2(data: str, deadline: Optional[Deadline] = None) -> int:
     """ Compute the result for part 2 """
     nodes, steps = read_input(data)
 
-    return count_steps_ghost(nodes, steps)
+    return count_steps_ghost_compiled(nodes, steps, deadline)
 
 
 def main():
@@ -94,7 +94,7 @@ def test_case_part2(input, expected):
     assert compute2(input) == expected
 
 
-@dataclass
+@dataclass(slots=True)
 class Node:
     """Representation of a node in the grid"""
 
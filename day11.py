@@ -63,7 +63,7 @@ class Grid:
         return [[mult if c.symbol == "X" else 1 for c in row] for row in self.grid]
 
 
-@dataclass(order=True)
+@dataclass(order=True, slots=True)
 class Node:
     row: int
     col: int
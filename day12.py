@@ -1,5 +1,14 @@
+import io
+import json
+import random
 from functools import lru_cache
+from typing import Optional
 
+from harness import check_engines
+from harness import register
+from progress import JsonSink
+from progress import Progress
+from progress import stderr_sink
 from utils import get_integers_from_line
 
 INPUT0 = """\
@@ -35,9 +44,33 @@ def test_case2():
     assert compute2(INPUT1) == EXPECTED2
 
 
+def test_progress():
+    """Test that progress is reported for every processed line"""
+    telemetry = io.StringIO()
+    progress = Progress(
+        "day12", sinks=[JsonSink(telemetry)], interval=0, check_every=1
+    )
+
+    with progress:
+        assert compute2(INPUT1, progress) == EXPECTED2
+
+    snapshots = [json.loads(line) for line in telemetry.getvalue().splitlines()]
+    assert snapshots[-1]["count"] == snapshots[-1]["total"] == 6
+    assert snapshots[-1]["eta"] == 0
+
+
+def test_engines():
+    """Test that all engines agree with the reference implementation"""
+    rng = random.Random(12)
+    for part in (1, 2):
+        check_engines("day12", part, engine_cases(part, rng))
+
+
 # For part 2 add cache to function. To avoid recalculating the same sequence.
 # Also changed groups parameter from list to tuple, since list is mutable and
 # thus not hashable for caching
+@register("day12", 1, reference=True)
+@register("day12", 2, reference=True)
 @lru_cache(maxsize=None)
 def count_arrangements(line: str, groups: tuple[int]) -> int:
     """
@@ -94,6 +127,69 @@ def count_arrangements(line: str, groups: tuple[int]) -> int:
     raise NotImplementedError("This code should not be reachable")
 
 
+@register("day12", 1)
+@register("day12", 2)
+def count_arrangements_dp(line: str, groups: tuple[int]) -> int:
+    """
+    Count the possible arrangements with a bottom-up dynamic programming table.
+
+    ways[i][j] is the number of arrangements of line[i:] using groups[j:].
+    """
+    n_line = len(line)
+    n_groups = len(groups)
+
+    # run[i] is the number of characters from i on that can be a broken spring
+    run = [0] * (n_line + 1)
+    for i in range(n_line - 1, -1, -1):
+        run[i] = 0 if line[i] == "." else run[i + 1] + 1
+
+    ways = [[0] * (n_groups + 1) for _ in range(n_line + 2)]
+    ways[n_line][n_groups] = 1
+    ways[n_line + 1][n_groups] = 1
+
+    for i in range(n_line - 1, -1, -1):
+        for j in range(n_groups, -1, -1):
+            result = 0
+            if line[i] != "#":
+                # fixed spring (or unknown used as a fixed spring)
+                result += ways[i + 1][j]
+
+            if line[i] != "." and j < n_groups:
+                # broken spring starting group j, needs a fixed spring after it
+                size = groups[j]
+                if run[i] >= size and (i + size == n_line or line[i + size] != "#"):
+                    result += ways[i + size + 1][j + 1]
+
+            ways[i][j] = result
+
+    return ways[0][0]
+
+
+def _random_case(rng: random.Random) -> tuple[str, tuple[int, ...]]:
+    """Generate a small random line of springs with random groups"""
+    line = "".join(rng.choice(".#?") for _ in range(rng.randint(1, 12)))
+    groups = tuple(rng.randint(1, 4) for _ in range(rng.randint(1, 4)))
+    return line, groups
+
+
+def engine_cases(part: int, rng: random.Random) -> list[tuple[str, tuple[int, ...]]]:
+    """
+    Cases for the engine harness: the example lines (unfolded for part 2)
+    and randomised small lines.
+    """
+    cases = []
+    for line in INPUT1.splitlines():
+        springs, raw_groups = line.split()
+        cases.append((springs, tuple(get_integers_from_line(raw_groups))))
+
+    cases += [_random_case(rng) for _ in range(500)]
+
+    if part == 2:
+        cases = [("?".join(5 * [springs]), 5 * groups) for springs, groups in cases]
+
+    return cases
+
+
 def compute(data: str) -> int:
     total = 0
     for line in data.splitlines():
@@ -107,9 +203,13 @@ def compute(data: str) -> int:
     return total
 
 
-def compute2(data: str) -> int:
+def compute2(data: str, progress: Optional[Progress] = None) -> int:
+    lines = data.splitlines()
+    if progress is not None:
+        progress.total = len(lines)
+
     total = 0
-    for line in data.splitlines():
+    for line in lines:
         format1, format2 = line.split()
 
         line = "?".join(5*[format1])
@@ -119,6 +219,9 @@ def compute2(data: str) -> int:
         # Get groupings of broken springs
         total += count_arrangements(line, groups)
 
+        if progress is not None:
+            progress.update()
+
     return total
 
 
@@ -128,7 +231,8 @@ def main():
         data = f.read()
 
     result = compute(data)
-    result2 = compute2(data)
+    with Progress("day12 part 2 lines", sinks=[stderr_sink]) as progress:
+        result2 = compute2(data, progress)
     print(f"{result=}")
     print(f"{result2=}")
 
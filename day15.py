@@ -40,6 +40,8 @@ def test_case2():
 class Step:
     """wrapper class for steps"""
 
+    __slots__ = ("symbol", "operator", "focal_length", "box_idx")
+
     def __init__(self, symbol: str, operator: str, focal_length: Optional[int] = None):
         self.symbol = symbol
         self.operator = operator
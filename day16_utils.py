@@ -10,6 +10,8 @@ from utils import Offsets
 class Lightbeam:
     """Representation of a lightbeam in cell"""
 
+    __slots__ = ("row", "col", "direction")
+
     def __init__(self, row: int, col: int, direction: Offsets):
         self.row = row
         self.col = col
@@ -1,6 +1,11 @@
 import math
 import re
+from typing import Optional
 
+import pytest
+
+from deadline import Deadline
+from deadline import SolveTimeout
 from day20_utils import HIGH
 from day20_utils import LOW
 from day20_utils import Broadcast
@@ -40,6 +45,12 @@ def test_case2():
     assert compute(INPUT2) == EXPECTED2
 
 
+def test_button_presses_times_out():
+    """Test that part 2 stops at the deadline if the rx sources never fire"""
+    with pytest.raises(SolveTimeout):
+        compute2(INPUT1, Deadline(0.05))
+
+
 def _read_line(line: str):
     """Read module information from a single line"""
     re_module = re.compile(r"(&|%)?([a-zA-Z]+)")
@@ -154,8 +165,13 @@ def compute_pulses(
 def compute_button_presses(
     modules: dict[str, Module],
     button: Button,
+    deadline: Optional[Deadline] = None,
 ) -> int:
-    """Compute low and high pulse count"""
+    """
+    Compute the number of button presses needed to send a low pulse to rx.
+
+    Never ends if the rx sources don't fire, unless a deadline is given.
+    """
     # start queue of pulses
     pulse_queue: list[Pulse] = []
     pulse_queue.append(button.push())
@@ -172,6 +188,9 @@ def compute_button_presses(
     }
 
     while True:
+        if deadline is not None:
+            deadline.tick()
+
         if not pulse_queue:
             # Queue is empty, push the button
             pulse = button.push()
@@ -215,13 +234,13 @@ def compute(data: str) -> int:
     return n_high * n_low
 
 
-def compute2(data: str) -> int:
+def compute2(data: str, deadline: Optional[Deadline] = None) -> int:
     modules = parse_modules(data)
 
     # Create button. Push button to start sequence
     button = Button()
 
-    n_button = compute_button_presses(modules, button)
+    n_button = compute_button_presses(modules, button, deadline)
 
     return n_button
 
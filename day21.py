@@ -28,6 +28,8 @@ def test_case1():
 class Node:
     """Representation of a Node"""
 
+    __slots__ = ("row", "col", "symbol")
+
     def __init__(self, row: int, col: int, symbol: str = "") -> None:
         self.row = row
         self.col = col
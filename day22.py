@@ -1,14 +1,19 @@
 from __future__ import annotations
 
-from collections import deque
+from array import array
 from dataclasses import dataclass
 from typing import Generator
 from typing import List
+from typing import Optional
 from typing import Set
 from typing import Tuple
 
 import pytest
 
+from graph_utils import CSRGraph
+from graph_utils import NodeInterner
+from graph_utils import topological_order
+
 INPUT1 = """\
 1,0,1~1,2,1
 0,0,2~2,0,2
@@ -122,7 +127,36 @@ def test_case2():
     assert compute2(INPUT1) == EXPECTED2
 
 
-@dataclass(frozen=True, eq=True)
+def _count_moved_bricks(bricks: List[Brick], deleted: int) -> int:
+    """Drop the settled bricks again without 1 brick, count the moved bricks"""
+    graph = Graph()
+    others = [brick for idx, brick in enumerate(bricks) if idx != deleted]
+    return sum(graph.add_brick(brick) != brick for brick in others)
+
+
+def test_chain_reaction_random():
+    """Test the chain reaction against deleting every brick and dropping again"""
+    import random
+
+    rng = random.Random(22)
+    for _ in range(30):
+        graph = Graph()
+        for z in range(1, 30):
+            x = rng.randint(0, 3)
+            y = rng.randint(0, 3)
+            if rng.random() < 0.5:
+                brick = Brick((x, min(x + rng.randint(0, 2), 3)), (y, y), (z, z))
+            else:
+                brick = Brick((x, x), (y, min(y + rng.randint(0, 2), 3)), (z, z))
+            graph.add_brick(brick)
+
+        expected = sum(
+            _count_moved_bricks(graph.bricks, idx) for idx in range(len(graph.bricks))
+        )
+        assert graph.calculate_chain_reaction() == expected
+
+
+@dataclass(frozen=True, eq=True, slots=True)
 class Brick:
     x: Tuple[int, int]
     y: Tuple[int, int]
@@ -164,6 +198,7 @@ class Graph:
         self._supported_by: dict[Brick, List[Brick]] = {}
         self._supports: dict[Brick, List[Brick]] = {self._ground: []}
         self._coord_support: dict[Tuple[int, int], Brick] = {}
+        self._csr: Optional[Tuple[NodeInterner[Brick], CSRGraph]] = None
 
     def add_brick(self, brick: Brick) -> Brick:
         """
@@ -174,6 +209,9 @@ class Graph:
         """
         height, supports = self._find_supporting_bricks(brick)
 
+        # The support graph changes, so the CSR version needs to be rebuilt
+        self._csr = None
+
         # brick will drop to z value 1 higher than the support bricks
         new_z = height + 1
         dropped_brick = brick.drop(new_z)
@@ -233,7 +271,24 @@ class Graph:
         """
         return self._supports.get(brick, [])
 
-    def _can_disintegrate(self, brick: Brick) -> bool:
+    def to_csr(self) -> Tuple[NodeInterner[Brick], CSRGraph]:
+        """
+        Intern the bricks to ints (the ground is node 0) and return the
+        support graph in CSR format. An edge u -> v means brick u supports v.
+        """
+        if self._csr is None:
+            interner = NodeInterner([self._ground, *self.bricks])
+            edges = [
+                (interner.index(brick), interner.index(supported))
+                for brick in interner.nodes
+                for supported in self.get_supports(brick)
+            ]
+            self._csr = interner, CSRGraph.from_edges(len(interner), edges)
+
+        return self._csr
+
+    @staticmethod
+    def _can_disintegrate(u: int, supports: CSRGraph, n_supported_by: array) -> bool:
         """
         Check if a brick can be safely disintegrated.
 
@@ -241,18 +296,7 @@ class Graph:
         e.g. it doesn't support any other brick, or all bricks that it supports have at
         least 1 more support
         """
-        supports = self.get_supports(brick)
-
-        # This brick doesn't support anything. So can be disintegrated
-        if len(supports) == 0:
-            return True
-
-        # If all bricks that are supported by the current brick,
-        # are supported by at least one other brick.
-        # This brick can be disintegrated
-        n_supported_by = [len(self.get_supported_by(x)) for x in supports]
-
-        return all(x > 1 for x in n_supported_by)
+        return all(n_supported_by[v] > 1 for v in supports.neighbours(u))
 
     def get_bricks_safe_to_disintegrate(self) -> Set[Brick]:
         """
@@ -262,49 +306,27 @@ class Graph:
         e.g. it doesn't support any other brick, or all bricks that it supports have at
         least 1 more support
         """
-        safe_bricks = [brick for brick in self.bricks if self._can_disintegrate(brick)]
-        return set(safe_bricks)
-
-    def _n_bricks_move_on_delete(self, brick: Brick) -> int:
+        interner, supports = self.to_csr()
+        n_supported_by = supports.in_degrees()
+
+        # skip node 0, the ground
+        return {
+            interner[u]
+            for u in range(1, supports.n_nodes)
+            if self._can_disintegrate(u, supports, n_supported_by)
+        }
+
+    @staticmethod
+    def _common_dominator(u: int, v: int, idom: array, depth: array) -> int:
         """
-        Calculate how many bricks will move in the stack if a certain brick is deleted.
-
-        This is done by using a queue and continuously remove moving bricks and
-        evaluating the bricks that were supported by the deleted bricks
+        Return the lowest brick that dominates both u and v, by walking up the
+        dominator tree from the deepest of the two.
         """
-
-        # Check if this brick doesn't move anything
-        if self._can_disintegrate(brick):
-            return 0
-
-        # instantiate empty set with removed bricks
-        is_removed: Set[Brick] = set()
-        queue = deque([brick])
-        result = 0
-
-        while queue:
-            qbrick = queue.popleft()
-            if qbrick in is_removed:
-                continue
-
-            # Keep track of what bricks are removed
-            is_removed.add(qbrick)
-
-            # get supports that will move if this brick is deleted
-            supports = self.get_supports(qbrick)
-
-            for support in supports:
-                # check if the brick is supported by any other not deleted brick
-                supported_by = [
-                    x for x in self.get_supported_by(support) if x not in is_removed
-                ]
-                if len(supported_by) == 0:
-                    # brick is no longer supported, so add it to the queue to process
-                    # and increment result
-                    queue.append(support)
-                    result += 1
-
-        return result
+        while u != v:
+            if depth[u] < depth[v]:
+                u, v = v, u
+            u = idom[u]
+        return u
 
     def calculate_chain_reaction(self) -> int:
         """
@@ -312,12 +334,35 @@ class Graph:
         was deleted.
 
         Returns the sum of total number of movebable bricks
+
+        Deleting brick u makes brick v fall if every chain of supports from
+        the ground to v passes through u, i.e. u dominates v. The bricks are
+        processed in topological order, so the supports of a brick are done
+        before it. Its immediate dominator is then the lowest common dominator
+        of its supports. Every brick falls for each of its dominators, other
+        than the ground, so the sum is the sum of the depths in the dominator
+        tree.
         """
-        total_moveable = 0
-        for brick in self.bricks:
-            total_moveable += self._n_bricks_move_on_delete(brick)
+        _, supports = self.to_csr()
+        supported_by = supports.reverse()
+
+        idom = array("i", [0] * supports.n_nodes)
+        depth = array("i", [0] * supports.n_nodes)
+
+        for v in topological_order(supports):
+            # node 0, the ground, is the root of the dominator tree
+            if v == 0:
+                continue
+
+            below = supported_by.neighbours(v)
+            dominator = below[0]
+            for u in below[1:]:
+                dominator = self._common_dominator(dominator, u, idom, depth)
+
+            idom[v] = dominator
+            depth[v] = depth[dominator] + 1
 
-        return total_moveable
+        return sum(depth[v] - 1 for v in range(1, supports.n_nodes))
 
 
 def parse_line(line: str) -> Brick:
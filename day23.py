@@ -5,6 +5,10 @@ from typing import Optional
 from typing import Set
 from typing import Tuple
 
+from graph_utils import CSRGraph
+from graph_utils import NodeInterner
+from progress import Progress
+from progress import stderr_sink
 from utils import Offsets
 
 INPUT1 = """\
@@ -44,7 +48,7 @@ def test_case2():
     assert compute2(INPUT1) == EXPECTED2
 
 
-@dataclass(frozen=True, eq=True, order=True)
+@dataclass(frozen=True, eq=True, order=True, slots=True)
 class Node:
     x: int
     y: int
@@ -298,26 +302,61 @@ class Grid:
         """
         return 0 <= x < self.ncols and 0 <= y < self.nrows
 
-    def find_longest_path(self, *, ignore_slope: bool) -> int:
+    def _build_csr_graph(
+        self, *, ignore_slope: bool
+    ) -> Tuple[NodeInterner[Node], CSRGraph]:
         """
-        Create graph from the maze and do breath first search search on the maze
+        Builds the graph out of the grid, with the nodes interned to ints.
+        The start node is node 0, the edge weights are the path lengths.
         """
-        longest_path = 0
-        start_node = self.get_start_node()
-        queue: List[Tuple[int, Set[Node], Node]] = [(0, set(), start_node)]
         graph = self._build_graph(ignore_slope=ignore_slope)
 
+        interner = NodeInterner([self.get_start_node()])
+        edges = []
+        weights = []
+        for node, children in graph.items():
+            for dist, child in children:
+                edges.append((interner.intern(node), interner.intern(child)))
+                weights.append(dist)
+
+        return interner, CSRGraph.from_edges(len(interner), edges, weights)
+
+    def find_longest_path(
+        self, *, ignore_slope: bool, progress: Optional[Progress] = None
+    ) -> int:
+        """
+        Create graph from the maze and do a depth first search on the maze.
+
+        The visited nodes of a path are kept as a bitmask over the node ints.
+        The optional progress is updated for every explored state.
+        """
+        interner, graph = self._build_csr_graph(ignore_slope=ignore_slope)
+        end = interner.index(self.get_end_node())
+        offsets = graph.offsets
+        targets = graph.targets
+        weights = graph.weights
+        assert weights is not None
+
+        longest_path = 0
+        # The start node is node 0
+        queue: List[Tuple[int, int, int]] = [(0, 0, 0)]
+
         while queue:
             qdist, qvisited, qnode = queue.pop()
 
-            if qnode.is_end:
+            if progress is not None:
+                progress.update()
+
+            if qnode == end:
                 if qdist > longest_path:
                     longest_path = qdist
                 continue
 
-            for ndist, nnode in graph[qnode]:
-                if nnode not in qvisited:
-                    queue.append((qdist + ndist, qvisited | {qnode}, nnode))
+            visited = qvisited | (1 << qnode)
+            for edge in range(offsets[qnode], offsets[qnode + 1]):
+                nnode = targets[edge]
+                if not visited >> nnode & 1:
+                    queue.append((qdist + weights[edge], visited, nnode))
 
         return longest_path
 
@@ -328,10 +367,10 @@ def compute(data: str) -> int:
     return grid.find_longest_path(ignore_slope=False)
 
 
-def compute2(data: str) -> int:
+def compute2(data: str, progress: Optional[Progress] = None) -> int:
     """Compute result for part 2"""
     grid = Grid(data)
-    return grid.find_longest_path(ignore_slope=True)
+    return grid.find_longest_path(ignore_slope=True, progress=progress)
 
 
 def main():
@@ -342,7 +381,8 @@ def main():
     result = compute(data)
     print(f"{result=}")
 
-    result2 = compute2(data)
+    with Progress("day23 part 2 states", sinks=[stderr_sink]) as progress:
+        result2 = compute2(data, progress)
     print(f"{result2=}")
 
 
@@ -1,8 +1,19 @@
 import random
+from array import array
 from collections import defaultdict
-from copy import deepcopy
 from typing import Dict
 from typing import List
+from typing import Optional
+
+import pytest
+
+from deadline import Deadline
+from deadline import SolveTimeout
+from graph_utils import CSRGraph
+from graph_utils import NodeInterner
+from graph_utils import UnionFind
+from progress import Progress
+from progress import stderr_sink
 
 INPUT1 = """\
 jqt: rhn xhk nvd
@@ -25,6 +36,13 @@ def test_case1():
     assert compute(INPUT1) == 54
 
 
+def test_impossible_cut_times_out():
+    """Test that the search for a cut that doesn't exist stops at the deadline"""
+    graph = parse_data(INPUT1)
+    with pytest.raises(SolveTimeout):
+        karger_algo(graph, 1, deadline=Deadline(0.05))
+
+
 def parse_data(data: str) -> dict[str, List[str]]:
     components = defaultdict(list)
     for line in data.splitlines():
@@ -36,66 +54,88 @@ def parse_data(data: str) -> dict[str, List[str]]:
     return components
 
 
-def karger_algo(graph: Dict[str, List[str]], n_edge: int):
+def karger_algo(
+    graph: Dict[str, List[str]],
+    n_edge: int,
+    progress: Optional[Progress] = None,
+    deadline: Optional[Deadline] = None,
+):
     """
     This is a basic implementation of Karger's Algorithm, slightly
     modified to ensure that the 2 end graphs are connected by exactly 3
     edges.
 
-    The idea is to contact 2 connected nodes together (and updating the edges)
-    until only 2 nodes remain. These 2 nodes then represent the split graph
+    The idea is to contract the edges of the graph in a random order
+    until only 2 nodes remain. These 2 nodes then represent the split graph.
+    The nodes are interned to ints, so the contractions are done with a
+    union-find over flat integer arrays.
 
     More info:
     https://en.wikipedia.org/wiki/Karger%27s_algorithm
+
+    The optional progress is updated for every trial run. Without a deadline
+    this runs until a cut is found, which never happens if it doesn't exist.
     """
+    interner = NodeInterner(graph)
+    csr = CSRGraph.from_edges(
+        len(interner),
+        [(interner.index(n1), interner.index(n2)) for n1 in graph for n2 in graph[n1]],
+    )
+
+    # Every edge is in the adjacency lists twice, only keep 1 direction
+    sources = array("i")
+    targets = array("i")
+    for u, v in csr.edges():
+        if u < v:
+            sources.append(u)
+            targets.append(v)
+
+    edge_order = list(range(len(sources)))
+
     while True:
-        # create a copy of the graph, since it isn't guaranteed to
-        # find the correct solution on the first iteration.
-        iter_graph = deepcopy(graph)
-
-        while len(iter_graph) > 2:
-            # randomly select 2 nodes that have an edge to contract
-            n1 = random.choice(sorted(iter_graph))
-            n2 = random.choice(iter_graph[n1])
-
-            # create new joined node
-            new_node = ",".join([n1, n2])
-
-            # create new edges
-            #
-            # Note: by using `pop` we remove `n1` and `n2` from the graph
-            # Note 2: if both have an edge to the same node (e.g. both nodes A and B
-            # are connected to node C), the edge needs to be added twice!
-            new_neighours = [
-                x for x in iter_graph.pop(n1) + iter_graph.pop(n2) if x not in (n1, n2)
-            ]
-
-            for n in new_neighours:
-                # For all the neighbours, remove the connection to the old nodes
-                # and add a connection to the newly contracted node.
-                iter_graph[n] = [x for x in iter_graph[n] if x not in (n1, n2)]
-                iter_graph[n].append(new_node)
-
-            # add neighbours for newly contracted node
-            iter_graph[new_node] = new_neighours
-
-        # If the number of edhes that remain equal `n_edge`
-        # we found a cut that satisfies the requirements
-        if max(len(x) for x in iter_graph.values()) == n_edge:
-            # Since the graph consists of only 2 nodes, we can count the number of
-            # riginal nodes by splitting the name on `,`. The puzzle result is then
-            # the multiplication of both these numbers
-            n_nodes1, n_nodes2 = [len(x.split(",")) for x in iter_graph]
-            return n_nodes1 * n_nodes2
+        if progress is not None:
+            progress.update()
+
+        if deadline is not None:
+            deadline.check()
+
+        # Contracting the edges in a random order is the same as
+        # repeatedly contracting a random remaining edge.
+        random.shuffle(edge_order)
+        components = UnionFind(csr.n_nodes)
+
+        for idx in edge_order:
+            if components.n_sets == 2:
+                break
+            components.union(sources[idx], targets[idx])
+
+        if components.n_sets != 2:
+            continue
+
+        # The edges that remain are the ones between both components.
+        # If their number equals `n_edge` we found a cut that satisfies the
+        # requirements.
+        n_cut = sum(
+            components.find(u) != components.find(v) for u, v in zip(sources, targets)
+        )
+        if n_cut == n_edge:
+            # The puzzle result is the multiplication of the number of
+            # original nodes in both components
+            n_nodes1 = components.size[components.find(0)]
+            return n_nodes1 * (csr.n_nodes - n_nodes1)
 
     # this is to make mypy happy
     raise AssertionError("Unreachable code")
 
 
-def compute(data: str) -> int:
+def compute(
+    data: str,
+    progress: Optional[Progress] = None,
+    deadline: Optional[Deadline] = None,
+) -> int:
     """compute result"""
     graph = parse_data(data)
-    return karger_algo(graph, 3)
+    return karger_algo(graph, 3, progress, deadline)
 
 
 def main():
@@ -103,7 +143,9 @@ def main():
     with open("day25_input.txt", "r") as f:
         data = f.read()
 
-    result = compute(data)
+    progress = Progress("day25 karger trials", sinks=[stderr_sink], check_every=1)
+    with progress:
+        result = compute(data, progress)
     print(f"{result=}")
 
 
@@ -0,0 +1,74 @@
+"""
+Cooperative deadlines and cancellation for solves.
+
+A `Deadline` is passed into a solver. Long running loops call `tick` (or
+`check`) periodically, which raises `SolveTimeout` once the deadline has
+passed or the deadline was cancelled. This way a solve stops in a controlled
+way instead of having to be killed.
+"""
+from __future__ import annotations
+
+import time
+from typing import Optional
+
+
+class SolveTimeout(Exception):
+    """ Raised when a solve passes its deadline or is cancelled """
+
+    def __init__(self, label: str, reason: str, elapsed: float) -> None:
+        super().__init__(f"{label} stopped after {elapsed:.2f}s: {reason}")
+        self.label = label
+        self.reason = reason
+        self.elapsed = elapsed
+
+
+class Deadline:
+    """
+    Deadline for a solve. Without a number of seconds, the deadline only
+    expires when it is cancelled.
+    """
+
+    def __init__(
+        self,
+        seconds: Optional[float] = None,
+        *,
+        label: str = "solve",
+        check_every: int = 1000,
+    ) -> None:
+        self.label = label
+        self.check_every = check_every
+        self.cancelled = False
+
+        self._start = time.monotonic()
+        self._end = None if seconds is None else self._start + seconds
+        self._until_check = check_every
+
+    def cancel(self) -> None:
+        """ Cancel the solve, it stops at the next check """
+        self.cancelled = True
+
+    @property
+    def expired(self) -> bool:
+        """ Return True if the deadline passed or was cancelled """
+        if self.cancelled:
+            return True
+        return self._end is not None and time.monotonic() >= self._end
+
+    def check(self) -> None:
+        """ Raise SolveTimeout if the deadline passed or was cancelled """
+        if self.cancelled:
+            reason = "cancelled"
+        elif self._end is not None and time.monotonic() >= self._end:
+            reason = "deadline passed"
+        else:
+            return
+
+        raise SolveTimeout(self.label, reason, time.monotonic() - self._start)
+
+    def tick(self) -> None:
+        """ Cheap version of check, that only checks every `check_every` calls """
+        self._until_check -= 1
+
+        if self._until_check <= 0:
+            self._until_check = self.check_every
+            self.check()
@@ -0,0 +1,257 @@
+"""
+Integer indexed graph core shared by the graph puzzles.
+
+Node identities (bricks, grid nodes, component names, ...) are interned to
+dense ints once, after which the graph algorithms only work on flat integer
+arrays. The adjacency is stored in CSR (compressed sparse row) format:
+the neighbours of node u are targets[offsets[u]:offsets[u + 1]].
+"""
+from __future__ import annotations
+
+from array import array
+from collections import deque
+from typing import Generator
+from typing import Generic
+from typing import Hashable
+from typing import Iterable
+from typing import Optional
+from typing import TypeVar
+
+import pytest
+
+T = TypeVar("T", bound=Hashable)
+
+
+def test_topological_order():
+    """ Test that every edge points forward in the topological order """
+    graph = CSRGraph.from_edges(5, [(3, 1), (1, 0), (3, 0), (4, 2), (2, 1)])
+    order = topological_order(graph)
+    position = {u: idx for idx, u in enumerate(order)}
+
+    assert sorted(order) == list(range(5))
+    assert all(position[u] < position[v] for u, v in graph.edges())
+
+
+def test_topological_order_cycle():
+    """ Test that a graph with a cycle raises a ValueError """
+    graph = CSRGraph.from_edges(4, [(0, 1), (1, 2), (2, 3), (3, 1)])
+    with pytest.raises(ValueError):
+        topological_order(graph)
+
+
+def test_bfs():
+    """ Test the bfs distances, with -1 for the unreachable nodes """
+    graph = CSRGraph.from_edges(6, [(0, 1), (1, 2), (0, 2), (2, 3), (4, 0)])
+
+    assert list(bfs(graph, 0)) == [0, 1, 1, 2, -1, -1]
+    assert list(bfs(graph, 4)) == [1, 2, 2, 3, 0, -1]
+
+
+def test_reverse():
+    """ Test that the reversed graph keeps the weights with their edges """
+    edges = [(0, 2), (1, 2), (0, 1), (2, 0)]
+    weights = [10, 20, 30, 40]
+    graph = CSRGraph.from_edges(3, edges, weights)
+    reverse = graph.reverse()
+
+    weighted = {
+        (v, u): reverse.weights[idx]
+        for idx, (u, v) in enumerate(reverse.edges())
+    }
+    assert weighted == dict(zip(edges, weights))
+    assert list(reverse.in_degrees()) == [2, 1, 1]
+
+
+class NodeInterner(Generic[T]):
+    """ Maps node identities to dense ints (in order of first appearance) """
+
+    def __init__(self, nodes: Iterable[T] = ()) -> None:
+        self.ids: dict[T, int] = {}
+        self.nodes: list[T] = []
+
+        for node in nodes:
+            self.intern(node)
+
+    def intern(self, node: T) -> int:
+        """ Return the int of the node, add it if it is not known yet """
+        idx = self.ids.get(node)
+        if idx is None:
+            idx = len(self.nodes)
+            self.ids[node] = idx
+            self.nodes.append(node)
+        return idx
+
+    def index(self, node: T) -> int:
+        """ Return the int of a known node """
+        return self.ids[node]
+
+    def __getitem__(self, idx: int) -> T:
+        return self.nodes[idx]
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+
+class CSRGraph:
+    """ Directed graph in CSR format, with optional edge weights """
+
+    def __init__(
+        self,
+        offsets: array,
+        targets: array,
+        weights: Optional[array] = None,
+    ) -> None:
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+
+    @classmethod
+    def from_edges(
+        cls,
+        n_nodes: int,
+        edges: Iterable[tuple[int, int]],
+        weights: Optional[Iterable[int]] = None,
+    ) -> CSRGraph:
+        """
+        Build the graph from (source, target) edges. The order of the edges
+        of a node is kept.
+        """
+        sources = array("i")
+        targets = array("i")
+        for source, target in edges:
+            sources.append(source)
+            targets.append(target)
+
+        edge_weights = None if weights is None else array("q", weights)
+
+        # Count the edges per node, the offsets are the cumulative counts
+        offsets = array("i", [0] * (n_nodes + 1))
+        for source in sources:
+            offsets[source + 1] += 1
+        for u in range(n_nodes):
+            offsets[u + 1] += offsets[u]
+
+        # Place every edge in the slot of its source node
+        position = array("i", offsets[:-1])
+        csr_targets = array("i", [0] * len(targets))
+        csr_weights = None if edge_weights is None else array("q", [0] * len(targets))
+        for idx, source in enumerate(sources):
+            slot = position[source]
+            position[source] += 1
+            csr_targets[slot] = targets[idx]
+            if csr_weights is not None and edge_weights is not None:
+                csr_weights[slot] = edge_weights[idx]
+
+        return cls(offsets, csr_targets, csr_weights)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.targets)
+
+    def neighbours(self, u: int) -> array:
+        """ Return the neighbours of node u """
+        return self.targets[self.offsets[u]:self.offsets[u + 1]]
+
+    def edges(self) -> Generator[tuple[int, int], None, None]:
+        """ Generate all (source, target) edges """
+        offsets = self.offsets
+        targets = self.targets
+        for u in range(self.n_nodes):
+            for idx in range(offsets[u], offsets[u + 1]):
+                yield u, targets[idx]
+
+    def in_degrees(self) -> array:
+        """ Return the number of incoming edges per node """
+        degrees = array("i", [0] * self.n_nodes)
+        for v in self.targets:
+            degrees[v] += 1
+        return degrees
+
+    def reverse(self) -> CSRGraph:
+        """ Return the graph with all edges reversed """
+        edges = [(v, u) for u, v in self.edges()]
+        return CSRGraph.from_edges(self.n_nodes, edges, self.weights)
+
+
+class UnionFind:
+    """ Disjoint sets over the ints 0..n-1 (union by size, path halving) """
+
+    def __init__(self, n: int) -> None:
+        self.parent = array("i", range(n))
+        self.size = array("i", [1] * n)
+        self.n_sets = n
+
+    def find(self, u: int) -> int:
+        """ Return the representative of the set containing u """
+        parent = self.parent
+        while parent[u] != u:
+            parent[u] = parent[parent[u]]
+            u = parent[u]
+        return u
+
+    def union(self, u: int, v: int) -> bool:
+        """ Join the sets of u and v. Returns False if already joined """
+        root_u = self.find(u)
+        root_v = self.find(v)
+        if root_u == root_v:
+            return False
+
+        if self.size[root_u] < self.size[root_v]:
+            root_u, root_v = root_v, root_u
+
+        self.parent[root_v] = root_u
+        self.size[root_u] += self.size[root_v]
+        self.n_sets -= 1
+        return True
+
+
+def topological_order(graph: CSRGraph) -> array:
+    """
+    Return the nodes in topological order (Kahn's algorithm).
+    Raises a ValueError if the graph contains a cycle.
+    """
+    degrees = graph.in_degrees()
+    offsets = graph.offsets
+    targets = graph.targets
+
+    order = array("i", (u for u in range(graph.n_nodes) if degrees[u] == 0))
+    idx = 0
+    while idx < len(order):
+        u = order[idx]
+        idx += 1
+        for edge in range(offsets[u], offsets[u + 1]):
+            v = targets[edge]
+            degrees[v] -= 1
+            if degrees[v] == 0:
+                order.append(v)
+
+    if len(order) != graph.n_nodes:
+        raise ValueError("Graph contains a cycle, no topological order exists")
+
+    return order
+
+
+def bfs(graph: CSRGraph, start: int) -> array:
+    """
+    Breadth first search from start.
+    Returns the number of edges to reach each node (-1 if unreachable).
+    """
+    dist = array("i", [-1] * graph.n_nodes)
+    offsets = graph.offsets
+    targets = graph.targets
+
+    dist[start] = 0
+    queue = deque([start])
+    while queue:
+        u = queue.popleft()
+        for edge in range(offsets[u], offsets[u + 1]):
+            v = targets[edge]
+            if dist[v] < 0:
+                dist[v] = dist[u] + 1
+                queue.append(v)
+
+    return dist
@@ -0,0 +1,148 @@
+"""
+Harness to check that alternative implementations (engines) of a puzzle part
+agree with the reference implementation, and how much faster they are.
+
+A day module registers its engines with the `register` decorator and provides
+a function `engine_cases(part, rng)` that returns a list of argument tuples
+(example inputs, generated inputs and randomised small cases) to run every
+engine of that part on.
+
+Usage:
+    python harness.py day05 day12
+"""
+from __future__ import annotations
+
+import importlib
+import random
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any
+from typing import Callable
+from typing import Iterable
+from typing import Optional
+
+
+@dataclass
+class Engine:
+    """ An implementation of a puzzle part """
+    name: str
+    func: Callable[..., Any]
+    reference: bool = False
+
+
+@dataclass
+class EngineReport:
+    """ Timing of an engine over a set of cases """
+    name: str
+    seconds: float
+    speedup: float
+
+
+# Registered engines per (day, part)
+ENGINES: dict[tuple[str, int], list[Engine]] = {}
+
+
+def register(
+        day: str,
+        part: int,
+        name: Optional[str] = None,
+        *,
+        reference: bool = False,
+        ) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Decorator to register a function as an engine for a day and part.
+    The function itself is returned unchanged.
+    """
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        engines = ENGINES.setdefault((day, part), [])
+
+        if reference and any(e.reference for e in engines):
+            raise ValueError(f"Reference engine already registered for {day=} {part=}")
+
+        engines.append(Engine(name or func.__name__, func, reference))
+        return func
+
+    return decorator
+
+
+def get_engines(day: str, part: int) -> list[Engine]:
+    """ Return the engines for a day and part, reference engine first """
+    engines = ENGINES.get((day, part), [])
+    reference = [e for e in engines if e.reference]
+
+    if not reference:
+        raise ValueError(f"No reference engine registered for {day=} {part=}")
+
+    return reference + [e for e in engines if not e.reference]
+
+
+def _run_engine(engine: Engine, cases: list[tuple]) -> tuple[list[Any], float]:
+    """ Run an engine on all cases. Returns the results and the elapsed time """
+    # Make sure a cache filled by an earlier run doesn't skew the timing
+    if hasattr(engine.func, "cache_clear"):
+        engine.func.cache_clear()
+
+    start = time.perf_counter()
+    results = [engine.func(*case) for case in cases]
+    elapsed = time.perf_counter() - start
+
+    return results, elapsed
+
+
+def check_engines(day: str, part: int, cases: Iterable[tuple]) -> list[EngineReport]:
+    """
+    Run all engines of a day and part on the cases and assert that they give
+    the same result as the reference engine.
+
+    Returns a report per engine with the speedup over the reference engine.
+    """
+    cases = list(cases)
+    reference, *others = get_engines(day, part)
+
+    expected, ref_seconds = _run_engine(reference, cases)
+    reports = [EngineReport(reference.name, ref_seconds, 1.0)]
+
+    for engine in others:
+        results, seconds = _run_engine(engine, cases)
+
+        for case, result, exp in zip(cases, results, expected):
+            if result != exp:
+                raise AssertionError(
+                    f"Engine '{engine.name}' disagrees with '{reference.name}' "
+                    f"for {case=}: {result=}, expected={exp}"
+                )
+
+        speedup = ref_seconds / seconds if seconds else float("inf")
+        reports.append(EngineReport(engine.name, seconds, speedup))
+
+    return reports
+
+
+def format_reports(day: str, part: int, reports: list[EngineReport]) -> str:
+    """ Format the engine reports as a small table """
+    lines = [f"{day} part {part}"]
+    for r in reports:
+        lines.append(f"  {r.name:<40} {r.seconds:10.4f}s {r.speedup:8.2f}x")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    """ Check the engines of the days given on the command line """
+    # When run as a script this module is `__main__`, while the day modules
+    # register their engines in the imported `harness` module.
+    harness = importlib.import_module("harness")
+    rng = random.Random(2023)
+
+    for day in sys.argv[1:]:
+        module = importlib.import_module(day)
+
+        parts = sorted(part for (d, part) in harness.ENGINES if d == day)
+        for part in parts:
+            cases = module.engine_cases(part, rng)
+            reports = harness.check_engines(day, part, cases)
+            print(harness.format_reports(day, part, reports))
+
+
+if __name__ == "__main__":
+    main()
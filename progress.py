@@ -0,0 +1,134 @@
+"""
+Progress reporting for long running solves.
+
+A loop updates a `Progress` counter. Only every `check_every` updates the
+clock is checked, and at most every `interval` seconds a snapshot of the
+progress is passed to the sinks. Which makes it cheap enough to update from
+a hot loop.
+
+Two sinks are provided:
+    - `stderr_sink`: renders a line of text on stderr
+    - `JsonSink`: writes the snapshot as a JSON line to a telemetry stream
+"""
+from __future__ import annotations
+
+import json
+import sys
+import time
+from typing import Any
+from typing import Callable
+from typing import Optional
+from typing import TextIO
+
+Snapshot = dict[str, Any]
+Sink = Callable[[Snapshot], None]
+
+
+class Progress:
+    """ Progress of a long running loop """
+
+    def __init__(
+        self,
+        label: str,
+        total: Optional[int] = None,
+        *,
+        sinks: Optional[list[Sink]] = None,
+        interval: float = 1.0,
+        check_every: int = 1000,
+    ) -> None:
+        self.label = label
+        self.total = total
+        self.sinks = sinks if sinks is not None else []
+        self.interval = interval
+        self.check_every = check_every
+
+        self.count = 0
+        self._until_check = check_every
+        self._start = time.monotonic()
+        self._next_report = self._start + interval
+
+    def __enter__(self) -> Progress:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def update(self, n: int = 1) -> None:
+        """ Add n to the progress count, report if the interval has passed """
+        self.count += n
+        self._until_check -= n
+
+        if self._until_check <= 0:
+            self._until_check = self.check_every
+            if time.monotonic() >= self._next_report:
+                self.report()
+
+    def snapshot(self) -> Snapshot:
+        """
+        Return the current state of the progress. Throughput is in updates
+        per second, eta in seconds (only known when the total is known).
+        """
+        elapsed = time.monotonic() - self._start
+        rate = self.count / elapsed if elapsed > 0 else 0.0
+
+        eta = None
+        if self.total is not None and rate > 0:
+            eta = max(self.total - self.count, 0) / rate
+
+        return {
+            "label": self.label,
+            "count": self.count,
+            "total": self.total,
+            "elapsed": elapsed,
+            "rate": rate,
+            "eta": eta,
+        }
+
+    def report(self) -> None:
+        """ Pass the current snapshot to all sinks """
+        self._next_report = time.monotonic() + self.interval
+
+        if not self.sinks:
+            return
+
+        snapshot = self.snapshot()
+        for sink in self.sinks:
+            sink(snapshot)
+
+    def close(self) -> None:
+        """ Report the final state """
+        self.report()
+
+
+def format_snapshot(snapshot: Snapshot) -> str:
+    """ Format a snapshot as a single line of text """
+    if snapshot["total"] is not None:
+        count = f"{snapshot['count']}/{snapshot['total']}"
+    else:
+        count = f"{snapshot['count']}"
+
+    line = (
+        f"{snapshot['label']}: {count} "
+        f"({snapshot['rate']:.0f}/s, {snapshot['elapsed']:.1f}s elapsed"
+    )
+
+    if snapshot["eta"] is not None:
+        line += f", eta {snapshot['eta']:.1f}s"
+
+    return line + ")"
+
+
+def stderr_sink(snapshot: Snapshot) -> None:
+    """ Render the snapshot on stderr """
+    print(format_snapshot(snapshot), file=sys.stderr, flush=True)
+
+
+class JsonSink:
+    """ Write every snapshot as a JSON line to a telemetry stream """
+
+    def __init__(self, stream: TextIO) -> None:
+        self.stream = stream
+
+    def __call__(self, snapshot: Snapshot) -> None:
+        self.stream.write(json.dumps(snapshot) + "\n")
+        self.stream.flush()